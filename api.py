@@ -1,61 +1,287 @@
+from dotenv import load_dotenv
+from instrumentation import configure_logging
+
+# Settings are read from the environment when modules are imported, so .env is loaded before them
+load_dotenv()
+configure_logging()
+
 from flask import Flask, jsonify, request, Response, stream_with_context
-from llm_tools import analyze_comp
+from llm_tools import all_comps, stream_analyze_comp, router
+from utils import get_companies_data
+from instrumentation import increment, render_prometheus, track_run
+from flights import ANALYSIS_WORKERS, FlightManager, Overloaded
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import closing
 from datetime import datetime
-import time, json
+import threading
+import argparse
+import logging
+import time
+import json
+import os
+
+# Seconds rejected clients are asked to wait before retrying
+RETRY_AFTER_SECONDS = int(os.getenv("RETRY_AFTER_SECONDS", 30))
+# Symbols accepted by one /api/batch request, and how many of them are analyzed at once
+BATCH_MAX_SYMBOLS = int(os.getenv("BATCH_MAX_SYMBOLS", 100))
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", ANALYSIS_WORKERS))
 
 app = Flask(__name__)
 
 
+def run_analysis(flight):
+    """
+    Generates the analysis of a flight's symbol, publishing its events, reasoning included.
+
+    Args:
+        flight (Flight): Flight of a symbol, with the client's context, if any, as its request
+
+    Returns:
+        dict: Context and Ollama fields of the final response
+    """
+    session = {"context": flight.request}
+    # A client's context can only be continued in session mode, whatever AGENT_MODE is
+    mode = "session" if flight.request else None
+    with track_run() as run_stats:
+        with closing(stream_analyze_comp(flight.key, mode=mode, session=session, events=True,
+                                         cancel_event=flight.cancel_event, thinking=True)) as events:
+            for event in events:
+                flight.publish(event)
+    return {"context": session.get("context") or [], **run_stats.response_fields()}
+
+
+flights = FlightManager(run_analysis)
+
+
 @app.route('/api/generate', methods=['POST'])
 def generate_text():
-    data = request.get_json()
-    prompt = data.get("prompt", "")
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({"error": "the body must be a JSON object"}), 400
+    if not isinstance(data.get("prompt", ""), str):
+        return jsonify({"error": "'prompt' must be a string"}), 400
+    if data.get("context") is not None and not isinstance(data["context"], list):
+        return jsonify({"error": "'context' must be a list"}), 400
     model = data.get("model", "")
     stream = data.get("stream", False)
+    # As in Ollama's API, the reasoning is only returned, in a separate 'thinking' field, when asked for
+    think = data.get("think", False)
+    # The prompt is the symbol to analyze, matched regardless of case
+    prompt = all_comps.index.exact(data.get("prompt", ""))
+    if prompt is None:
+        suggestions = all_comps.index.search(data.get("prompt", ""), limit=5)
+        return jsonify({"error": f"unknown symbol '{data.get('prompt', '')}'", "suggestions": suggestions}), 404
+
+    # Concurrent requests for the same symbol share one analysis, except requests with a context,
+    # whose analysis runs in session mode from the client's own context and returns Ollama's context
+    context = data.get("context")
+    try:
+        flight, attached = flights.join(prompt, request=context, shared=not context)
+    except Overloaded as e:
+        increment("api_generate_requests_total", result="rejected")
+        logging.warning(f"Rejected analysis of {prompt}: {e}")
+        return jsonify({"error": "server busy, retry later"}), 503, {"Retry-After": str(RETRY_AFTER_SECONDS)}
+    increment("api_generate_requests_total", result="attached" if attached else "started")
+
+    events = flight.subscribe()
 
     def generate_stream():
-        """ Generator function to stream response chunks. """
-        for chunk in analyze_comp(prompt):
-            response_data = {
-                "model": model,
-                "created_at": datetime.utcnow().isoformat() + "Z",
-                "response": chunk,
-                "done": False
-            }
-            yield json.dumps(response_data) + "\n"
+        """ Generator function to stream response chunks as NDJSON, token by token. """
+        try:
+            for event in events:
+                if event["event"] == "thinking" and not think:
+                    continue
+                response_data = {
+                    "model": model,
+                    "created_at": datetime.utcnow().isoformat() + "Z",
+                    "response": event.get("response", ""),
+                    "done": False
+                }
+                if event["event"] == "thinking":
+                    response_data["thinking"] = event["thinking"]
+                elif event["event"] != "token":
+                    # Agent boundaries carry an empty response, so Ollama clients can ignore them
+                    response_data["event"] = event["event"]
+                    response_data["agent"] = event["agent"]
+                yield json.dumps(response_data) + "\n"
+        except Exception as e:
+            yield json.dumps({"error": str(e)}) + "\n"
+            return
+        finally:
+            # Runs when the client disconnects too; the analysis stops once no request follows it
+            events.close()
 
         # Send final completion message
         final_response = {
             "model": model,
             "created_at": datetime.utcnow().isoformat() + "Z",
-            "response": "[STREAMING COMPLETED]",
+            "response": "",
             "done": True,
+            "done_reason": "stop",
+            **flight.fields,
         }
         yield json.dumps(final_response) + "\n"
 
     if stream:
-        return Response(stream_with_context(generate_stream()), content_type='application/json')
+        response = Response(stream_with_context(generate_stream()), content_type='application/x-ndjson')
+        # Closing the response detaches the request even if the client left before the stream started
+        response.call_on_close(events.close)
+        return response
     else:
-        start_time = time.perf_counter()
-        res = "\n".join(analyze_comp(prompt))
-        end_time = time.perf_counter()
+        try:
+            answers = [event["answer"] for event in events if event["event"] == "agent_end"]
+        except Exception as e:
+            return jsonify({"error": str(e)}), 500
+        finally:
+            events.close()
+        res = "\n".join(answers)
 
+        # Durations are in nanoseconds and counts are summed over all agents, as in Ollama's API
         response_data = {
             "model": model,
             "created_at": datetime.utcnow().isoformat() + "Z",
             "response": res,
             "done": True,
-            "context": [1, 2, 3],
-            "total_duration": end_time - start_time,
-            "load_duration": end_time - start_time,
-            "prompt_eval_count": -1,
-            "prompt_eval_duration": -1,
-            "eval_count": -1,
-            "eval_duration": -1
+            **flight.fields,
         }
 
         return jsonify(response_data)
 
 
+def analyze_batch_symbol(symbol, cancel_event):
+    """
+    Analyzes one symbol of a batch through the flights, waiting while the queue is full.
+
+    Args:
+        symbol (str): Company stock symbol
+        cancel_event (threading.Event): Set when the batch's client disconnected
+
+    Returns:
+        dict: Record of the symbol, with its answers or error and its timings in seconds
+    """
+    start = time.perf_counter()
+    record = {"symbol": symbol}
+    while True:
+        try:
+            flight, record["attached"] = flights.join(symbol)
+            break
+        except Overloaded:
+            # A batch waits for room instead of being rejected, its concurrency already bounds it
+            if cancel_event.wait(1):
+                return {**record, "status": "cancelled"}
+    record["queued_seconds"] = round(time.perf_counter() - start, 3)
+    events = flight.subscribe()
+    try:
+        answers = []
+        for event in events:
+            if cancel_event.is_set():
+                return {**record, "status": "cancelled"}
+            if event["event"] == "agent_end":
+                answers.append(event["answer"])
+        fields = {key: value for key, value in flight.fields.items() if key != "context"}
+        record.update(status="completed", response="\n".join(answers), **fields)
+    except Exception as e:
+        record.update(status="failed", error=str(e))
+    finally:
+        events.close()
+    record["seconds"] = round(time.perf_counter() - start, 3)
+    return record
+
+
+@app.route('/api/batch', methods=['POST'])
+def generate_batch():
+    """
+    Analyzes several symbols, streaming one NDJSON record per symbol in the order they complete,
+    followed by a summary record with "done": true.
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({"error": "the body must be a JSON object"}), 400
+    requested = data.get("symbols") or []
+    if not isinstance(requested, list) or not requested:
+        return jsonify({"error": "'symbols' must be a non-empty list"}), 400
+    if len(requested) > BATCH_MAX_SYMBOLS:
+        return jsonify({"error": f"at most {BATCH_MAX_SYMBOLS} symbols per batch"}), 400
+    concurrency = data.get("concurrency", BATCH_CONCURRENCY)
+    if not isinstance(concurrency, int) or isinstance(concurrency, bool):
+        return jsonify({"error": "'concurrency' must be an integer"}), 400
+    concurrency = max(1, min(concurrency, BATCH_CONCURRENCY))
+    symbols, unknown = [], []
+    for query in requested:
+        symbol = all_comps.index.exact(str(query))
+        if symbol is None:
+            unknown.append(str(query))
+        elif symbol not in symbols:
+            symbols.append(symbol)
+
+    def generate_records():
+        start = time.perf_counter()
+        summary = {"completed": 0, "failed": 0, "cancelled": 0}
+        for query in unknown:
+            summary["failed"] += 1
+            yield json.dumps({"symbol": query, "status": "failed", "error": "unknown symbol"}) + "\n"
+
+        # One bulk fetch, so the analyses find their data in the cache instead of fetching symbol by symbol
+        fetch_start = time.perf_counter()
+        try:
+            get_companies_data(symbols)
+        except Exception as e:
+            logging.exception(f"Fetching the data of batch {symbols} failed")
+            for symbol in symbols:
+                summary["failed"] += 1
+                yield json.dumps({"symbol": symbol, "status": "failed", "error": str(e)}) + "\n"
+            symbols.clear()
+        fetch_seconds = round(time.perf_counter() - fetch_start, 3)
+
+        cancel_event = threading.Event()
+        pool = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="batch-api")
+        try:
+            futures = [pool.submit(analyze_batch_symbol, symbol, cancel_event) for symbol in symbols]
+            for future in as_completed(futures):
+                record = future.result()
+                summary[record["status"]] += 1
+                yield json.dumps(record) + "\n"
+        finally:
+            # Runs when the client disconnects too, which stops following the remaining flights
+            cancel_event.set()
+            pool.shutdown(wait=False, cancel_futures=True)
+
+        yield json.dumps({"done": True, "symbols": len(requested), **summary, "fetch_seconds": fetch_seconds,
+                          "seconds": round(time.perf_counter() - start, 3)}) + "\n"
+
+    return Response(stream_with_context(generate_records()), content_type='application/x-ndjson')
+
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    cache_stats = router.stats()
+    text = render_prometheus() + (
+        "# HELP llm_cache_requests_total LLM response cache lookups\n"
+        "# TYPE llm_cache_requests_total counter\n"
+        f'llm_cache_requests_total{{result="hit"}} {cache_stats["hits"]}\n'
+        f'llm_cache_requests_total{{result="miss"}} {cache_stats["misses"]}\n'
+        "# HELP llm_cache_size_bytes Size of the LLM response cache\n"
+        "# TYPE llm_cache_size_bytes gauge\n"
+        f'llm_cache_size_bytes {cache_stats["size_bytes"]}\n'
+        "# HELP analysis_flights Analyses running or waiting for a worker\n"
+        "# TYPE analysis_flights gauge\n"
+        + "".join(f'analysis_flights{{state="{state}"}} {count}\n' for state, count in flights.stats().items())
+    )
+    return Response(text, content_type='text/plain; version=0.0.4')
+
+
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=3000, debug=True)
+    parser = argparse.ArgumentParser(description="Serve the analysis API")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=3000)
+    parser.add_argument("--threads", type=int, default=int(os.getenv("API_THREADS", 32)),
+                        help="requests served at once; a streaming request holds a thread until it completes")
+    parser.add_argument("--dev", action="store_true", help="use Flask's debug server, which reloads on changes")
+    args = parser.parse_args()
+    if args.dev:
+        app.run(host=args.host, port=args.port, debug=True)
+    else:
+        from waitress import serve
+
+        # One process, so that every request can attach to the analyses in flight
+        serve(app, host=args.host, port=args.port, threads=args.threads)
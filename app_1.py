@@ -1,90 +1,106 @@
+from dotenv import load_dotenv
+from instrumentation import configure_logging
+
+# Settings are read from the environment when modules are imported, so .env is loaded before them
+load_dotenv()
+configure_logging()
+
 import streamlit as st
 from llm_tools import analyze_comp
-from utils import get_top_n_companies, get_company_data
+from app_data import load_companies, search_companies, load_company_data, get_analysis, set_analysis
 import plotly.graph_objects as go
 from fpdf import FPDF
-import base64
 
 def generate_pdf(company_name, company_data, analysis_text):
+    """
+    Renders the financial report of a company in memory.
+
+    Args:
+        company_name (str): Company stock symbol
+        company_data (dict): Company data returned by load_company_data
+        analysis_text (str): Generated analysis
+
+    Returns:
+        bytes: The PDF document
+    """
     pdf = FPDF()
     pdf.set_auto_page_break(auto=True, margin=15)
     pdf.add_page()
     pdf.set_font("Arial", style='B', size=16)
     pdf.cell(200, 10, f"Financial Report: {company_name}", ln=True, align='C')
     pdf.ln(10)
-    
+
     pdf.set_font("Arial", size=12)
     pdf.cell(200, 10, f"Industry: {company_data['assetProfile']['industry']}", ln=True)
     pdf.cell(200, 10, f"Sector: {company_data['assetProfile']['sector']}", ln=True)
     pdf.cell(200, 10, f"Current Stock Price: ${company_data['price']['regularMarketPrice']:.2f}", ln=True)
     pdf.ln(5)
-    
-    pdf.cell(200, 10, "Financial Health:", ln=True, style='B')
+
+    pdf.set_font("Arial", style='B', size=12)
+    pdf.cell(200, 10, "Financial Health:", ln=True)
+    pdf.set_font("Arial", size=12)
     pdf.cell(200, 10, f"Revenue: ${company_data['financialData']['totalRevenue'] / 1_000_000:,.2f}M", ln=True)
     pdf.cell(200, 10, f"EBITDA: ${company_data['financialData']['ebitda'] / 1_000_000:,.2f}M", ln=True)
     pdf.cell(200, 10, f"Profit Margin: {company_data['financialData']['profitMargins']:.2%}", ln=True)
     pdf.ln(5)
-    
-    pdf.cell(200, 10, "AI-Powered Analysis:", ln=True, style='B')
-    pdf.multi_cell(0, 10, analysis_text)
-    
-    pdf_output = f"{company_name}_financial_report.pdf"
-    pdf.output(pdf_output)
-    
-    return pdf_output
+
+    pdf.set_font("Arial", style='B', size=12)
+    pdf.cell(200, 10, "AI-Powered Analysis:", ln=True)
+    pdf.set_font("Arial", size=12)
+    # The core PDF fonts only cover latin-1
+    pdf.multi_cell(0, 10, analysis_text.encode("latin-1", "replace").decode("latin-1"))
+
+    output = pdf.output(dest='S')
+    return output.encode("latin-1") if isinstance(output, str) else bytes(output)
 
 def main():
     st.title("DeepSeek Financial Analysis")
-    
-    st.sidebar.header("Company Selection")
-    companies = get_top_n_companies(100)
 
-    if "selected_company" not in st.session_state:
-        st.session_state.selected_company = list(companies.keys())[0]
-        st.session_state.company_data = get_company_data(st.session_state.selected_company)
+    st.sidebar.header("Company Selection")
+    companies = load_companies(100)
 
-    selected_company = st.sidebar.selectbox("Choose a company", list(companies.keys()), index=list(companies.keys()).index(st.session_state.selected_company))
+    # Bound to the session state, so the selection survives reruns
+    query = st.sidebar.text_input("Search by symbol or name")
+    selected_company = st.sidebar.selectbox("Choose a company", search_companies(companies, query),
+                                            format_func=lambda symbol: f"{symbol} - {companies[symbol]}",
+                                            key="selected_company")
 
-    if selected_company != st.session_state.selected_company:
-        st.session_state.selected_company = selected_company
-        st.session_state.company_data = get_company_data(selected_company)
+    company_data = load_company_data(selected_company)
 
-    company_data = st.session_state.company_data
-    
     st.header(f"Analysis for {companies[selected_company]} ({selected_company})")
-    
+
     st.subheader("Company Overview")
-    st.write(f"Industry: {company_data[selected_company]['assetProfile']['industry']}")
-    st.write(f"Sector: {company_data[selected_company]['assetProfile']['sector']}")
-    st.write(f"Current Stock Price: ${company_data[selected_company]['price']['regularMarketPrice']:.2f}")
-    
+    st.write(f"Industry: {company_data['assetProfile']['industry']}")
+    st.write(f"Sector: {company_data['assetProfile']['sector']}")
+    st.write(f"Current Stock Price: ${company_data['price']['regularMarketPrice']:.2f}")
+
     st.subheader("Financial Health")
     col1, col2, col3 = st.columns(3)
-    col1.metric("Revenue", f"${company_data[selected_company]['financialData']['totalRevenue'] / 1_000_000:,.2f}M")
-    col2.metric("EBITDA", f"${company_data[selected_company]['financialData']['ebitda'] / 1_000_000:,.2f}M")
-    col3.metric("Profit Margin", f"{company_data[selected_company]['financialData']['profitMargins']:.2%}")
-    
+    col1.metric("Revenue", f"${company_data['financialData']['totalRevenue'] / 1_000_000:,.2f}M")
+    col2.metric("EBITDA", f"${company_data['financialData']['ebitda'] / 1_000_000:,.2f}M")
+    col3.metric("Profit Margin", f"{company_data['financialData']['profitMargins']:.2%}")
+
     st.subheader("Stock Price History")
-    historical_data = company_data[selected_company]['historical_price']
+    historical_data = company_data['historical_price']
     fig = go.Figure(data=go.Scatter(x=historical_data['date'], y=historical_data['close'], mode="lines", name="Stock Price"))
     st.plotly_chart(fig)
-    
+
     st.subheader("AI-Powered Analysis")
-    analysis_text = ""
+    analysis_placeholder = st.empty()
     if st.button("Generate Analysis"):
-        analysis_placeholder = st.empty()
         analysis_placeholder.text("Generating analysis...")
+        analysis_text = ""
         for chunk in analyze_comp(selected_company):
             analysis_text += chunk + "\n"
             analysis_placeholder.markdown(analysis_text)
-    
-    if analysis_text:
-        pdf_file = generate_pdf(selected_company, company_data[selected_company], analysis_text)
-        with open(pdf_file, "rb") as f:
-            pdf_bytes = f.read()
-            b64_pdf = base64.b64encode(pdf_bytes).decode()
-            href = f'<a href="data:application/octet-stream;base64,{b64_pdf}" download="{pdf_file}">Download PDF Report</a>'
-            st.markdown(href, unsafe_allow_html=True)
+        set_analysis(selected_company, analysis_text, generate_pdf(selected_company, company_data, analysis_text))
+
+    # Kept in the session, so downloading the report or any other rerun does not call the LLM again
+    analysis = get_analysis(selected_company)
+    if analysis:
+        analysis_placeholder.markdown(analysis["text"])
+        st.download_button("Download PDF Report", data=analysis["pdf"],
+                           file_name=f"{selected_company}_financial_report.pdf", mime="application/pdf")
 
 if __name__ == "__main__":
     main()
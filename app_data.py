@@ -0,0 +1,68 @@
+import streamlit as st
+from utils import CACHE_TTLS, get_company_data, universe
+
+
+def load_companies(n=100):
+    """
+    Returns the top N most active companies from the universe snapshot shared by all sessions.
+
+    Args:
+        n (int, optional): Number of companies to retrieve. Defaults to 100.
+
+    Returns:
+        dict: Dictionary mapping company symbols to company names
+    """
+    return universe.top(n)
+
+
+def search_companies(companies, query):
+    """
+    Narrows the company selection to the ones matching a search by symbol or name.
+
+    Args:
+        companies (dict): Companies returned by load_companies
+        query (str): Search text, empty for all companies
+
+    Returns:
+        list: Matching symbols among `companies`, all of them if the query is empty or matches none
+    """
+    if not query.strip():
+        return list(companies)
+    matches = [symbol for symbol in universe.index.search(query, limit=len(companies)) if symbol in companies]
+    return matches or list(companies)
+
+
+# Cached no longer than the most volatile kind of data (the price), so the apps show the same
+# data as the on-disk cache without reading and unpickling it on every rerun
+@st.cache_data(ttl=min(CACHE_TTLS.values()), max_entries=500, show_spinner="Loading company data...")
+def load_company_data(symbol):
+    """
+    Fetches a company's data, cached for all sessions of the Streamlit server.
+
+    Args:
+        symbol (str): Company stock symbol
+
+    Returns:
+        dict: Company data including financial statements, market data, and historical prices
+    """
+    return get_company_data(symbol)[symbol]
+
+
+def get_analysis(symbol):
+    """
+    Returns:
+        dict: The analysis generated for a symbol in this session, {'text', 'pdf'}, or None
+    """
+    return st.session_state.setdefault("analyses", {}).get(symbol)
+
+
+def set_analysis(symbol, text, pdf=None):
+    """
+    Keeps a generated analysis in the session state, so reruns show it without calling the LLM again.
+
+    Args:
+        symbol (str): Company stock symbol
+        text (str): Analysis text
+        pdf (bytes, optional): PDF report of the analysis. Defaults to None.
+    """
+    st.session_state.setdefault("analyses", {})[symbol] = {"text": text, "pdf": pdf}
@@ -0,0 +1,200 @@
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from datetime import date
+import threading
+import logging
+import time
+import json
+import os
+
+CHECKPOINT_PATH = "data/batch_checkpoint.json"
+REPORT_PATH = "data/batch_report.json"
+
+
+def fetch_symbols(symbols, refresh_statements=None):
+    """
+    Fetches the data of a chunk of companies in the parent process, so that every chunk shares
+    its Yahoo Finance session pool, rate limit and in-flight fetches.
+
+    Args:
+        symbols (list): Company stock symbols
+        refresh_statements (bool, optional): Fetch the statements even if they cannot have changed.
+            Defaults to FORCE_STATEMENT_REFRESH.
+
+    Returns:
+        tuple: (mapping of symbol to company data, seconds spent)
+    """
+    from utils import get_companies_data
+
+    start = time.perf_counter()
+    data = get_companies_data(symbols, refresh_statements=refresh_statements)
+    return data, time.perf_counter() - start
+
+
+def prepare_symbol(symbol, data):
+    """
+    Builds a company's prompts from its fetched data. Runs in a worker process.
+
+    Args:
+        symbol (str): Company stock symbol
+        data (dict): The company's data returned by fetch_symbols
+
+    Returns:
+        tuple: (prompts, seconds spent)
+    """
+    from llm_tools import build_prompts
+
+    start = time.perf_counter()
+    messages = build_prompts({symbol: data}, symbol)
+    return messages, time.perf_counter() - start
+
+
+def generate_report(symbol, messages, mode=None):
+    """
+    Runs the agents on prepared prompts and saves the analysis.
+
+    Args:
+        symbol (str): Company stock symbol
+        messages (list): Prompts returned by prepare_symbol
+        mode (str, optional): Agent execution mode passed to analyze. Defaults to AGENT_MODE.
+
+    Returns:
+        float: Seconds spent generating
+    """
+    from llm_tools import analyze, save_analysis
+
+    start = time.perf_counter()
+    save_analysis(symbol, analyze(messages, mode=mode))
+    return time.perf_counter() - start
+
+
+def load_checkpoint(path=CHECKPOINT_PATH):
+    """
+    Loads today's checkpoint, so that a crashed run resumes where it stopped.
+
+    Args:
+        path (str, optional): Checkpoint file. Defaults to CHECKPOINT_PATH.
+
+    Returns:
+        dict: {'date', 'completed'} where completed maps symbols to their timings
+    """
+    today = date.today().isoformat()
+    if os.path.exists(path):
+        with open(path, "r") as file:
+            checkpoint = json.load(file)
+        if checkpoint.get("date") == today:
+            return checkpoint
+    return {"date": today, "completed": {}}
+
+
+def save_checkpoint(checkpoint, path=CHECKPOINT_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = path + ".tmp"
+    with open(temp_path, "w") as file:
+        json.dump(checkpoint, file, indent=2)
+    os.replace(temp_path, path)
+
+
+def run_batch(symbols, fetch_workers=4, llm_concurrency=1, mode=None, resume=True, refresh_statements=None,
+              prompt_workers=2, chunk_size=10):
+    """
+    Regenerates ./data/{symbol}_analysis.md for many symbols.
+
+    Data is fetched in chunks of symbols by threads of this process, so all of them draw from
+    one YAHOO_RATE and share their fetches, and prompts are built in a process pool. Both run
+    ahead of LLM generation, which runs on a bounded thread pool, so the LLM does not wait on
+    Yahoo Finance between symbols. Every completed symbol is checkpointed; with `resume` a
+    rerun on the same day skips them.
+
+    Args:
+        symbols (list): Company stock symbols
+        fetch_workers (int, optional): Chunks fetched at the same time. Defaults to 4.
+        llm_concurrency (int, optional): Symbols generated at the same time. Defaults to 1.
+        mode (str, optional): Agent execution mode passed to analyze. Defaults to AGENT_MODE.
+        resume (bool, optional): Skip symbols completed earlier today. Defaults to True.
+        refresh_statements (bool, optional): Fetch the statements even if no earnings date passed since they
+            were fetched. Defaults to FORCE_STATEMENT_REFRESH.
+        prompt_workers (int, optional): Processes building prompts. Defaults to 2.
+        chunk_size (int, optional): Symbols fetched in one request batch. Defaults to 10.
+
+    Returns:
+        dict: Mapping of symbol to {'status', 'fetch_seconds', 'llm_seconds', 'error'}, where fetch_seconds
+            is the symbol's share of its chunk's fetch plus building its prompts
+    """
+    checkpoint = load_checkpoint() if resume else {"date": date.today().isoformat(), "completed": {}}
+    report = {symbol: {**timings, "status": "skipped"} for symbol, timings in checkpoint["completed"].items()
+              if symbol in symbols}
+    pending = [symbol for symbol in symbols if symbol not in checkpoint["completed"]]
+    logging.info(f"Batch run: {len(pending)} symbols pending, {len(report)} already completed today")
+    lock = threading.Lock()
+
+    def on_generated(symbol, fetch_seconds, future):
+        with lock:
+            try:
+                llm_seconds = future.result()
+            except Exception as e:
+                logging.error(f"Generating analysis for {symbol} failed: {e}")
+                report[symbol] = {"status": "failed", "fetch_seconds": fetch_seconds, "error": str(e)}
+                return
+            timings = {"fetch_seconds": round(fetch_seconds, 2), "llm_seconds": round(llm_seconds, 2)}
+            report[symbol] = {**timings, "status": "completed"}
+            checkpoint["completed"][symbol] = timings
+            save_checkpoint(checkpoint)
+            logging.info(f"{symbol} completed: fetch {fetch_seconds:.1f}s, LLM {llm_seconds:.1f}s "
+                         f"({len(checkpoint['completed'])}/{len(symbols)})")
+
+    with ThreadPoolExecutor(max_workers=fetch_workers, thread_name_prefix="batch-fetch") as fetch_pool, \
+            ProcessPoolExecutor(max_workers=prompt_workers) as prompt_pool, \
+            ThreadPoolExecutor(max_workers=llm_concurrency, thread_name_prefix="batch-llm") as llm_pool:
+        chunks = [pending[start:start + chunk_size] for start in range(0, len(pending), chunk_size)]
+        # Fetched chunks and prepared symbols are handled in the order they complete, so the LLM
+        # starts on the first symbols while later chunks are still fetched
+        futures = {fetch_pool.submit(fetch_symbols, chunk, refresh_statements): ("fetch", chunk) for chunk in chunks}
+        while futures:
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                kind, item = futures.pop(future)
+                if kind == "fetch":
+                    try:
+                        data, seconds = future.result()
+                    except Exception as e:
+                        logging.error(f"Fetching {' '.join(item)} failed: {e}")
+                        with lock:
+                            report.update({symbol: {"status": "failed", "error": str(e)} for symbol in item})
+                        continue
+                    for symbol in item:
+                        futures[prompt_pool.submit(prepare_symbol, symbol, data[symbol])] = \
+                            ("prepare", (symbol, seconds / len(item)))
+                    continue
+
+                symbol, fetch_seconds = item
+                try:
+                    messages, prompt_seconds = future.result()
+                except Exception as e:
+                    logging.error(f"Preparing {symbol} failed: {e}")
+                    with lock:
+                        report[symbol] = {"status": "failed", "error": str(e)}
+                    continue
+                fetch_seconds += prompt_seconds
+                generated = llm_pool.submit(generate_report, symbol, messages, mode)
+                generated.add_done_callback(lambda f, symbol=symbol, fetch_seconds=fetch_seconds:
+                                            on_generated(symbol, fetch_seconds, f))
+
+    os.makedirs(os.path.dirname(REPORT_PATH), exist_ok=True)
+    with open(REPORT_PATH, "w") as file:
+        json.dump(report, file, indent=2)
+    return report
+
+
+def print_report(report):
+    """
+    Prints per-symbol timings and failures of a batch run.
+
+    Args:
+        report (dict): Output of run_batch
+    """
+    print(f"{'symbol':<8} {'status':<10} {'fetch s':>8} {'LLM s':>8}  error")
+    for symbol, result in sorted(report.items()):
+        print(f"{symbol:<8} {result['status']:<10} {result.get('fetch_seconds', ''):>8} "
+              f"{result.get('llm_seconds', ''):>8}  {result.get('error', '')}")
+    failed = [symbol for symbol, result in report.items() if result["status"] == "failed"]
+    print(f"{len(report) - len(failed)} succeeded, {len(failed)} failed: {' '.join(failed)}")
@@ -0,0 +1,326 @@
+"""
+Benchmarks the analysis pipeline on replayed fixtures with the fake LLM, so results only
+depend on the code and can be compared across commits on an air-gapped machine.
+
+Record fixtures once (needs network access):
+    python bench.py --record 250
+
+Run the benchmark and compare with an earlier result:
+    python bench.py --sizes 1 50 250 --compare data/benchmarks/<commit>.json
+
+Check how long the entry points take to import, per module, against IMPORT_BUDGETS:
+    python bench.py --imports
+"""
+from datetime import datetime, timezone
+import subprocess
+import argparse
+import platform
+import tempfile
+import tracemalloc
+import shutil
+import time
+import json
+import sys
+import os
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+STAGES = ["get_company_data", "process_historical_data", "compute_financial_metrics", "filter_financial_summary",
+          "build_prompts", "analyze_comp"]
+# Seconds each entry point may take to import. Heavy dependencies (pandas, yahooquery, the Ollama
+# client) are imported on first use, so a worker or CLI starts without them.
+IMPORT_BUDGETS = {"api": 0.5, "terminal_run": 0.2}
+
+
+def git_commit():
+    """
+    Returns:
+        tuple: (commit hash, whether the working tree has uncommitted changes)
+    """
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=ROOT,
+                                    capture_output=True, text=True, check=True).stdout.strip())
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown", False
+    return commit, dirty
+
+
+def measure(func, items, repeat=1, setup=None):
+    """
+    Times a function over a list of items and measures its peak memory in a separate pass,
+    since tracing allocations slows the code down.
+
+    Args:
+        func (callable): Called once per item
+        items (list): Arguments of the calls
+        repeat (int, optional): Timed passes, of which the fastest is kept. Defaults to 1.
+        setup (callable, optional): Called before every pass, outside the measurement. Defaults to None.
+
+    Returns:
+        dict: Seconds for all items, milliseconds per item, items per second and peak traced bytes
+    """
+    seconds = float("inf")
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        for item in items:
+            func(item)
+        seconds = min(seconds, time.perf_counter() - start)
+
+    if setup:
+        setup()
+    tracemalloc.start()
+    try:
+        for item in items:
+            func(item)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {
+        "seconds": round(seconds, 4),
+        "ms_per_symbol": round(seconds / len(items) * 1000, 3),
+        "symbols_per_sec": round(len(items) / seconds, 2) if seconds else None,
+        "peak_bytes": peak,
+    }
+
+
+def run_benchmarks(sizes, repeat=1, stages=STAGES, mode=None):
+    """
+    Runs every stage for every universe size.
+
+    The universe is the recorded symbols; sizes larger than it reuse symbols in turn.
+
+    Args:
+        sizes (list): Numbers of symbols
+        repeat (int, optional): Timed passes per measurement. Defaults to 1.
+        stages (list, optional): Stages to run. Defaults to STAGES.
+        mode (str, optional): Agent execution mode of analyze_comp. Defaults to AGENT_MODE.
+
+    Returns:
+        dict: Mapping of stage to a mapping of size to the output of measure
+    """
+    import llm_tools
+    from utils import get_company_data, process_historical_data, compute_financial_metrics, filter_financial_summary
+
+    universe = list(llm_tools.all_comps)
+    if not universe:
+        raise SystemExit("No fixtures to replay, record them first with --record")
+
+    # Preprocessing stages are measured on data already loaded, without the fetch
+    data = {symbol: get_company_data(symbol)[symbol] for symbol in universe}
+    processed = {symbol: process_historical_data(data[symbol]['historical_price']) for symbol in universe}
+
+    def build_prompts(symbol):
+        llm_tools.build_prompts({symbol: data[symbol]}, symbol)
+
+    def reset_indicators():
+        # Prompts are built from an empty indicator state, i.e. the first run of the day
+        shutil.rmtree(os.path.join("data", "indicators"), ignore_errors=True)
+
+    functions = {
+        "get_company_data": lambda symbol: get_company_data(symbol, use_cache=False),
+        "process_historical_data": lambda symbol: process_historical_data(data[symbol]['historical_price']),
+        "compute_financial_metrics": lambda symbol: compute_financial_metrics(data[symbol]['balance_sheet'],
+                                                                              data[symbol]['cash_flow']),
+        "filter_financial_summary": lambda symbol: filter_financial_summary(processed[symbol]),
+        "build_prompts": build_prompts,
+        "analyze_comp": lambda symbol: llm_tools.analyze_comp(symbol, mode=mode),
+    }
+
+    results = {}
+    for name in stages:
+        results[name] = {}
+        for size in sizes:
+            symbols = [universe[i % len(universe)] for i in range(size)]
+            setup = reset_indicators if name in ("build_prompts", "analyze_comp") else None
+            results[name][str(size)] = measure(functions[name], symbols, repeat=repeat, setup=setup)
+            print(f"{name:<26} {size:>4} symbols  {results[name][str(size)]['ms_per_symbol']:>9.2f} ms/symbol  "
+                  f"peak {results[name][str(size)]['peak_bytes'] / 1e6:>7.1f} MB", flush=True)
+    return results
+
+
+def compare(results, baseline, threshold):
+    """
+    Prints the change of every measurement against a baseline.
+
+    Args:
+        results (dict): Current 'results'
+        baseline (dict): 'results' of an earlier run
+        threshold (float): Relative slowdown or memory growth reported as a regression, e.g. 0.2
+
+    Returns:
+        list: Descriptions of the regressions
+    """
+    regressions = []
+    print(f"\n{'stage':<26} {'size':>4} {'time':>8} {'memory':>8}")
+    for name, sizes in results.items():
+        for size, current in sizes.items():
+            previous = baseline.get(name, {}).get(size)
+            if not previous:
+                continue
+            time_change = current["seconds"] / previous["seconds"] - 1 if previous["seconds"] else 0
+            memory_change = current["peak_bytes"] / previous["peak_bytes"] - 1 if previous["peak_bytes"] else 0
+            print(f"{name:<26} {size:>4} {time_change:>+8.1%} {memory_change:>+8.1%}")
+            if time_change > threshold:
+                regressions.append(f"{name} ({size} symbols) is {time_change:.0%} slower")
+            if memory_change > threshold:
+                regressions.append(f"{name} ({size} symbols) uses {memory_change:.0%} more memory")
+    return regressions
+
+
+def profile_imports(module, repeat=3):
+    """
+    Imports a module in a fresh interpreter with -X importtime.
+
+    Args:
+        module (str): Module to import
+        repeat (int, optional): Interpreters started, of which the fastest is kept. Defaults to 3.
+
+    Returns:
+        dict: Total seconds, and seconds spent in each top-level package, most expensive first
+    """
+    env = {**os.environ, "PYTHONPATH": ROOT, "LOGGING_LEVEL": os.getenv("LOGGING_LEVEL", "30")}
+    best = None
+    for _ in range(repeat):
+        with tempfile.TemporaryDirectory(prefix="bench-imports-") as workdir:
+            # Started in an empty directory, so that nothing imported may rely on the files of ./data
+            process = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], cwd=workdir,
+                                     env=env, capture_output=True, text=True)
+        if process.returncode:
+            raise SystemExit(f"Importing {module} failed:\n{process.stderr[-2000:]}")
+        packages = {}
+        total = 0
+        for line in process.stderr.splitlines():
+            if not line.startswith("import time:") or "cumulative" in line:
+                continue
+            own, cumulative, name = line.split(":", 1)[1].split("|")
+            package = name.strip().split(".")[0]
+            # Self times add up to the total, whereas cumulative times of nested imports overlap
+            packages[package] = packages.get(package, 0) + int(own)
+            # A module is listed after its imports; top-level lines before it were imported at startup
+            if len(name) - len(name.lstrip()) == 1:
+                if name.strip() == module:
+                    total = int(cumulative)
+                    break
+                packages = {}
+        if best is None or total < best["seconds"] * 1e6:
+            best = {"seconds": round(total / 1e6, 4),
+                    "packages": {package: round(micros / 1e6, 4) for package, micros in
+                                 sorted(packages.items(), key=lambda item: -item[1])}}
+    return best
+
+
+def check_imports(budgets, repeat=3, top=10):
+    """
+    Prints the import profile of entry points and checks them against their budgets.
+
+    Args:
+        budgets (dict): Mapping of module to the seconds it may take to import
+        repeat (int, optional): Interpreters started per module. Defaults to 3.
+        top (int, optional): Packages listed per module. Defaults to 10.
+
+    Returns:
+        list: Descriptions of the modules over budget
+    """
+    exceeded = []
+    for module, budget in budgets.items():
+        profile = profile_imports(module, repeat)
+        print(f"{module}: {profile['seconds'] * 1000:.0f} ms (budget {budget * 1000:.0f} ms)")
+        for package, seconds in list(profile["packages"].items())[:top]:
+            print(f"    {package:<30} {seconds * 1000:8.1f} ms")
+        if profile["seconds"] > budget:
+            exceeded.append(f"importing {module} takes {profile['seconds'] * 1000:.0f} ms, "
+                            f"over its budget of {budget * 1000:.0f} ms")
+    return exceeded
+
+
+def record(count):
+    """
+    Records the fixtures of the `count` most active companies from Yahoo Finance.
+
+    Args:
+        count (int): Number of companies
+    """
+    from utils import get_top_n_companies, get_companies_data
+
+    symbols = list(get_top_n_companies(count))
+    get_companies_data(symbols, use_cache=False)
+    print(f"Recorded {len(symbols)} symbols to {os.environ['FIXTURES_DIR']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the analysis pipeline on replayed fixtures")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 50, 250], help="numbers of symbols")
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=STAGES, help="stages to benchmark")
+    parser.add_argument("--repeat", type=int, default=3, help="timed passes per measurement, the fastest is kept")
+    parser.add_argument("--mode", choices=["sequential", "parallel", "session"], help="agent execution mode")
+    parser.add_argument("--fixtures", default=os.getenv("FIXTURES_DIR", os.path.join(ROOT, "fixtures")),
+                        help="fixture directory")
+    parser.add_argument("--output", help="results file, defaults to data/benchmarks/{commit}.json")
+    parser.add_argument("--compare", help="results file of an earlier run to compare with")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="relative slowdown or memory growth that fails the --compare check")
+    parser.add_argument("--record", type=int, metavar="N", help="record fixtures of the N most active companies")
+    parser.add_argument("--imports", action="store_true",
+                        help="profile the import of the entry points and fail if one exceeds IMPORT_BUDGETS")
+    args = parser.parse_args()
+
+    if args.imports:
+        exceeded = check_imports(IMPORT_BUDGETS, repeat=args.repeat)
+        for problem in exceeded:
+            print(f"REGRESSION: {problem}")
+        sys.exit(1 if exceeded else 0)
+
+    commit, dirty = git_commit()
+    output = os.path.abspath(args.output or os.path.join(ROOT, "data", "benchmarks", f"{commit}.json"))
+    baseline = os.path.abspath(args.compare) if args.compare else None
+    os.environ["FIXTURES_DIR"] = os.path.abspath(args.fixtures)
+    os.environ["DATA_PROVIDER"] = "record" if args.record else "replay"
+    os.environ["LLM_BACKEND"] = "fake"
+    os.environ["LLM_CACHE_BYPASS"] = "1"
+    os.environ.setdefault("LOGGING_LEVEL", "30")
+
+    # Caches, indicator state and analyses are written to a scratch directory, not ./data
+    workdir = tempfile.mkdtemp(prefix="bench-")
+    shutil.copy(os.path.join(ROOT, "prompts.yaml"), workdir)
+    os.chdir(workdir)
+    try:
+        if args.record:
+            record(args.record)
+            return
+
+        results = run_benchmarks(args.sizes, repeat=args.repeat, stages=args.stages, mode=args.mode)
+    finally:
+        os.chdir(ROOT)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    import pandas as pd
+    report = {
+        "commit": commit,
+        "dirty": dirty,
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "platform": platform.platform(),
+        "config": {"sizes": args.sizes, "repeat": args.repeat, "mode": args.mode or os.getenv("AGENT_MODE", "sequential"),
+                   "fixtures": args.fixtures},
+        "results": results,
+    }
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w") as file:
+        json.dump(report, file, indent=2)
+    print(f"Results saved in {output}")
+
+    if baseline:
+        with open(baseline, "r") as file:
+            regressions = compare(results, json.load(file)["results"], args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION: {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+import sqlite3
+import pickle
+import threading
+import time
+import os
+import logging
+
+
+class SQLiteCache:
+    """
+    Size-bounded key/value store persisted in a single SQLite file.
+
+    Values are pickled, so DataFrames and nested dicts returned by yahooquery can be
+    stored as-is. When the total stored size exceeds `max_bytes`, the least recently
+    accessed entries are evicted first.
+    """
+
+    def __init__(self, path, max_bytes=256 * 1024 * 1024):
+        """
+        The database is only opened on first use, so creating a cache at import time costs nothing.
+
+        Args:
+            path (str): Location of the SQLite database file
+            max_bytes (int, optional): Upper bound on the total size of stored values.
+                Defaults to 256 MB.
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self._pid = None
+        self._connect_lock = threading.Lock()
+
+    def _connect(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "key TEXT PRIMARY KEY, value BLOB, size INTEGER, stored_at REAL, accessed_at REAL)"
+            )
+        self._pid = os.getpid()
+
+    def _check_fork(self):
+        # Connects on first use, and again in a forked child, e.g. a ProcessPoolExecutor worker,
+        # since SQLite connections must not be shared with it
+        if self._pid != os.getpid():
+            with self._connect_lock:
+                if self._pid != os.getpid():
+                    self._connect()
+
+    def get(self, key):
+        """
+        Reads an entry and marks it as recently used.
+
+        Args:
+            key (str): Cache key
+
+        Returns:
+            tuple: (value, stored_at) or None if the key is not cached
+        """
+        self._check_fork()
+        with self._lock:
+            row = self._conn.execute("SELECT value, stored_at FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            with self._conn:
+                self._conn.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (time.time(), key))
+        try:
+            return pickle.loads(row[0]), row[1]
+        except Exception as e:
+            logging.warning(f"Dropping unreadable cache entry {key}: {e}")
+            self.delete(key)
+            return None
+
+    def set(self, key, value, stored_at=None):
+        """
+        Stores a value and evicts old entries if the size bound is exceeded.
+
+        Args:
+            key (str): Cache key
+            value: Any picklable object
+            stored_at (float, optional): Timestamp to record. Defaults to now.
+        """
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        now = time.time()
+        self._check_fork()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries (key, value, size, stored_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, blob, len(blob), stored_at or now, now)
+            )
+        self.evict()
+
+    def delete(self, key):
+        self._check_fork()
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+
+    def clear(self):
+        self._check_fork()
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM entries")
+
+    def total_size(self):
+        self._check_fork()
+        with self._lock:
+            return self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+    def evict(self):
+        """
+        Removes least recently accessed entries until the total size fits `max_bytes`.
+
+        Returns:
+            int: Number of evicted entries
+        """
+        self._check_fork()
+        with self._lock, self._conn:
+            total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+            if total <= self.max_bytes:
+                return 0
+            evicted = []
+            for key, size in self._conn.execute("SELECT key, size FROM entries ORDER BY accessed_at ASC"):
+                if total <= self.max_bytes:
+                    break
+                evicted.append((key,))
+                total -= size
+            self._conn.executemany("DELETE FROM entries WHERE key = ?", evicted)
+        logging.debug(f"Evicted {len(evicted)} cache entries from {self.path}")
+        return len(evicted)
+
+    def lookup(self, key, ttl, stale_ttl=None):
+        """
+        Reads an entry and classifies it by age.
+
+        Args:
+            key (str): Cache key
+            ttl (float): Seconds for which an entry is considered fresh
+            stale_ttl (float, optional): Seconds for which an expired entry may still be
+                served while it is refreshed. Defaults to no stale window.
+
+        Returns:
+            tuple: (value, state) where state is 'fresh', 'stale' or 'miss'
+        """
+        entry = self.get(key)
+        if entry is None:
+            return None, "miss"
+        value, stored_at = entry
+        age = time.time() - stored_at
+        if age < ttl:
+            return value, "fresh"
+        if stale_ttl is not None and age < stale_ttl:
+            return value, "stale"
+        return None, "miss"
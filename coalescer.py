@@ -0,0 +1,45 @@
+from concurrent.futures import Future
+import threading
+
+
+class Coalescer:
+    """
+    Lets concurrent callers share one in-flight fetch of the same key.
+
+    The first caller of a key becomes its owner and must call resolve or fail; later callers
+    get the owner's Future and wait on it instead of fetching again.
+    """
+
+    def __init__(self):
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def claim(self, keys):
+        """
+        Args:
+            keys (list): Keys the caller is about to fetch
+
+        Returns:
+            tuple: (keys now owned by the caller, mapping of the other keys to the owner's Future)
+        """
+        owned, waiting = [], {}
+        with self._lock:
+            for key in keys:
+                if key in self._inflight:
+                    waiting[key] = self._inflight[key]
+                else:
+                    self._inflight[key] = Future()
+                    owned.append(key)
+        return owned, waiting
+
+    def resolve(self, key, value):
+        with self._lock:
+            future = self._inflight.pop(key, None)
+        if future is not None:
+            future.set_result(value)
+
+    def fail(self, key, error):
+        with self._lock:
+            future = self._inflight.pop(key, None)
+        if future is not None:
+            future.set_exception(error)
@@ -0,0 +1,158 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import threading
+import hashlib
+import random
+import json
+import time
+import os
+
+_WORDS = ("revenue", "margin", "growth", "debt", "liquidity", "valuation", "stable", "risk", "cash", "flow",
+          "earnings", "sector", "trend", "investors", "ratio", "strong", "moderate", "outlook", "Hold", "Buy",
+          "Healthy", "Undervalued", "Overvalued")
+
+
+class FakeLLM:
+    """
+    Deterministic stand-in for OllamaClient, for benchmarks and tests without an Ollama server.
+
+    The answer to a prompt is always the same text, derived from a hash of the model and prompt,
+    and it is produced at a configurable speed. It implements the same backend interface as
+    OllamaClient: generate, generate_stream, invoke and stream, returning Ollama-shaped
+    responses with context and counters.
+    """
+
+    def __init__(self, model="fake", tokens_per_sec=None, prompt_tokens_per_sec=None, answer_tokens=None,
+                 options=None):
+        """
+        Args:
+            model (str, optional): Reported model name. Defaults to 'fake'.
+            tokens_per_sec (float, optional): Generation speed, 0 for no delay. Defaults to FAKE_LLM_TOKENS_PER_SEC or 0.
+            prompt_tokens_per_sec (float, optional): Prompt evaluation speed, 0 for no delay.
+                Defaults to FAKE_LLM_PROMPT_TOKENS_PER_SEC or 0.
+            answer_tokens (int, optional): Tokens per answer. Defaults to FAKE_LLM_ANSWER_TOKENS or 200.
+            options (dict, optional): Accepted for interface compatibility, they do not change answers
+        """
+        self.model = model
+        self.tokens_per_sec = float(tokens_per_sec if tokens_per_sec is not None
+                                    else os.getenv("FAKE_LLM_TOKENS_PER_SEC", 0))
+        self.prompt_tokens_per_sec = float(prompt_tokens_per_sec if prompt_tokens_per_sec is not None
+                                           else os.getenv("FAKE_LLM_PROMPT_TOKENS_PER_SEC", 0))
+        self.answer_tokens = int(answer_tokens or os.getenv("FAKE_LLM_ANSWER_TOKENS", 200))
+        self.options = options or {}
+
+    def _tokens(self, prompt, context):
+        seed = hashlib.sha256(f"{self.model}\n{context or []}\n{prompt}".encode("utf-8")).digest()
+        rng = random.Random(seed)
+        words = [rng.choice(_WORDS) + " " for _ in range(self.answer_tokens)]
+        return ["<think>", "fake ", "reasoning", "</think>", "\n"] + words
+
+    def _final(self, prompt, context, tokens, start, prompt_seconds, eval_seconds):
+        prompt_count = len(prompt.split())
+        # Like Ollama, the returned context covers the previous context, the prompt and the answer
+        new_context = list(context or []) + [len(token) for token in tokens] + [prompt_count]
+        return {
+            "model": self.model,
+            "done": True,
+            "done_reason": "stop",
+            "context": new_context,
+            "total_duration": int((time.perf_counter() - start) * 1e9),
+            "load_duration": 0,
+            "prompt_eval_count": prompt_count,
+            "prompt_eval_duration": int(prompt_seconds * 1e9),
+            "eval_count": len(tokens),
+            "eval_duration": int(eval_seconds * 1e9),
+        }
+
+    def _evaluate_prompt(self, prompt):
+        if self.prompt_tokens_per_sec:
+            seconds = len(prompt.split()) / self.prompt_tokens_per_sec
+            time.sleep(seconds)
+            return seconds
+        return 0.0
+
+    def generate(self, prompt, context=None, options=None):
+        start = time.perf_counter()
+        prompt_seconds = self._evaluate_prompt(prompt)
+        tokens = self._tokens(prompt, context)
+        eval_seconds = len(tokens) / self.tokens_per_sec if self.tokens_per_sec else 0.0
+        time.sleep(eval_seconds)
+        return {**self._final(prompt, context, tokens, start, prompt_seconds, eval_seconds),
+                "response": "".join(tokens)}
+
+    def generate_stream(self, prompt, context=None, options=None):
+        start = time.perf_counter()
+        prompt_seconds = self._evaluate_prompt(prompt)
+        tokens = self._tokens(prompt, context)
+        eval_start = time.perf_counter()
+        for token in tokens:
+            if self.tokens_per_sec:
+                time.sleep(1 / self.tokens_per_sec)
+            yield {"model": self.model, "response": token, "done": False}
+        yield {**self._final(prompt, context, tokens, start, prompt_seconds, time.perf_counter() - eval_start),
+               "response": ""}
+
+    def invoke(self, prompt):
+        return self.generate(prompt)["response"]
+
+    def stream(self, prompt):
+        for chunk in self.generate_stream(prompt):
+            if chunk.get("response"):
+                yield chunk["response"]
+
+
+class _FakeOllamaHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        if self.path != "/api/generate":
+            self.send_error(404)
+            return
+        payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        llm = FakeLLM(model=payload.get("model", "fake"), **self.server.llm_options)
+        prompt, context = payload.get("prompt", ""), payload.get("context")
+        # Like Ollama with OLLAMA_NUM_PARALLEL, only `parallel` requests are evaluated at once
+        with self.server.slots:
+            time.sleep(self.server.latency)
+            try:
+                if payload.get("stream", True):
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/x-ndjson")
+                    self.end_headers()
+                    for chunk in llm.generate_stream(prompt, context):
+                        self.wfile.write((json.dumps(chunk) + "\n").encode("utf-8"))
+                        self.wfile.flush()
+                else:
+                    body = json.dumps(llm.generate(prompt, context)).encode("utf-8")
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+            except (BrokenPipeError, ConnectionResetError):
+                # The client cancelled, which frees the slot as Ollama does
+                pass
+
+
+def serve_fake_ollama(host="127.0.0.1", port=0, latency=0.0, parallel=1, **llm_options):
+    """
+    Serves FakeLLM answers on Ollama's /api/generate in a background thread, so that the API can be
+    run end to end, through OllamaClient, without a model.
+
+    Args:
+        host (str, optional): Defaults to 127.0.0.1.
+        port (int, optional): Defaults to a free port.
+        latency (float, optional): Seconds before a request is evaluated, e.g. to load the model. Defaults to 0.
+        parallel (int, optional): Requests evaluated at once, the others wait. Defaults to 1, as in Ollama.
+        **llm_options: tokens_per_sec, prompt_tokens_per_sec and answer_tokens of FakeLLM
+
+    Returns:
+        ThreadingHTTPServer: The running server; its address is server_address, stop it with shutdown()
+    """
+    server = ThreadingHTTPServer((host, port), _FakeOllamaHandler)
+    server.daemon_threads = True
+    server.latency = latency
+    server.slots = threading.Semaphore(parallel)
+    server.llm_options = llm_options
+    threading.Thread(target=server.serve_forever, name="fake-ollama", daemon=True).start()
+    return server
@@ -0,0 +1,220 @@
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import os
+import logging
+
+# Analyses generated at once; the single Ollama instance serves them one request at a time anyway
+ANALYSIS_WORKERS = int(os.getenv("ANALYSIS_WORKERS", 1))
+# Analyses waiting for a worker before further ones are rejected
+ANALYSIS_QUEUE = int(os.getenv("ANALYSIS_QUEUE", 8))
+
+
+class Overloaded(Exception):
+    """
+    Raised when every worker is busy and the queue is full.
+    """
+
+
+class Flight:
+    """
+    One analysis in progress, whose events are replayed to every request attached to it.
+
+    Events are kept until the analysis completes, so a request attaching late first receives
+    everything streamed so far and then follows the live events. The analysis is cancelled
+    once the last attached request goes away.
+    """
+
+    def __init__(self, key, request=None):
+        self.key = key
+        self.request = request
+        self.events = []
+        self.done = False
+        self.error = None
+        self.fields = {}
+        self.cancel_event = threading.Event()
+        self._subscribers = 0
+        self._condition = threading.Condition()
+
+    def publish(self, event):
+        with self._condition:
+            self.events.append(event)
+            self._condition.notify_all()
+
+    def finish(self, fields=None, error=None):
+        """
+        Args:
+            fields (dict, optional): Fields of the final response, e.g. the context and durations
+            error (Exception, optional): Raised to every attached request instead
+        """
+        with self._condition:
+            self.fields = fields or {}
+            self.error = error
+            self.done = True
+            self._condition.notify_all()
+
+    def attach(self):
+        """
+        Returns:
+            bool: False if the flight was already abandoned by all its requests
+        """
+        with self._condition:
+            if self.cancel_event.is_set():
+                return False
+            self._subscribers += 1
+            return True
+
+    def detach(self):
+        """
+        Releases one attached request, cancelling the analysis once none is left.
+        """
+        with self._condition:
+            self._subscribers -= 1
+            if self._subscribers == 0 and not self.done:
+                logging.info(f"All requests for {self.key} left, cancelling the analysis")
+                self.cancel_event.set()
+
+    def subscribe(self):
+        """
+        Follows the events of a flight the caller attached to.
+
+        Returns:
+            Subscription: Iterates the events; close it to detach, even if it was never iterated
+        """
+        return Subscription(self)
+
+    def _follow(self):
+        index = 0
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: index < len(self.events) or self.done)
+                events = self.events[index:]
+                done, error = self.done, self.error
+            index += len(events)
+            yield from events
+            if done and index == len(self.events):
+                if error is not None:
+                    raise error
+                return
+
+
+class Subscription:
+    """
+    The events of a flight for one attached request, from the first one.
+
+    The request is detached when the events are exhausted or fail, or when close() is called.
+    close() also detaches a subscription that was never iterated, e.g. the stream of a client
+    that disconnected before the server started sending it, which a generator's `finally`
+    would not.
+
+    Raises:
+        Exception: While iterating, the error the analysis failed with
+    """
+
+    def __init__(self, flight):
+        self.flight = flight
+        self._events = flight._follow()
+        self._closed = False
+        self._lock = threading.Lock()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            return next(self._events)
+        except BaseException:
+            self.close()
+            raise
+
+    def close(self):
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        self._events.close()
+        self.flight.detach()
+
+
+class FlightManager:
+    """
+    Runs analyses on a bounded pool, with identical concurrent requests sharing one analysis.
+
+    Requests for a key already in flight attach to it (single flight). Others start a new flight
+    if fewer than `workers + queue_size` are pending and are rejected with Overloaded otherwise,
+    so a burst cannot queue unbounded work in front of the LLM.
+    """
+
+    def __init__(self, run, workers=None, queue_size=None):
+        """
+        Args:
+            run (callable): Called with a Flight on a worker thread; publishes its events and returns
+                the fields of the final response
+            workers (int, optional): Analyses run at once. Defaults to ANALYSIS_WORKERS.
+            queue_size (int, optional): Analyses waiting for a worker. Defaults to ANALYSIS_QUEUE.
+        """
+        self.run = run
+        self.workers = workers or ANALYSIS_WORKERS
+        self.queue_size = ANALYSIS_QUEUE if queue_size is None else queue_size
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="analysis")
+        self._flights = {}
+        self._pending = 0
+        self._running = 0
+        self._lock = threading.Lock()
+
+    def join(self, key, request=None, shared=True):
+        """
+        Attaches to the flight of a key, starting one if none is in progress.
+
+        Args:
+            key: Identifies identical requests, e.g. the symbol
+            request (optional): What `run` needs to start the flight, kept as flight.request
+            shared (bool, optional): Let other requests attach to a new flight, False for requests that
+                must run on their own, e.g. ones continuing a client's context. Defaults to True.
+
+        Returns:
+            tuple: (Flight, whether it was already in progress); follow it with flight.subscribe() and close
+                that when done
+
+        Raises:
+            Overloaded: If a new flight is needed and the queue is full
+        """
+        with self._lock:
+            flight = self._flights.get(key) if shared else None
+            if flight is not None and flight.attach():
+                return flight, True
+            if self._pending >= self.workers + self.queue_size:
+                raise Overloaded(f"{self._pending} analyses are pending")
+            flight = Flight(key, request)
+            flight.attach()
+            if shared:
+                self._flights[key] = flight
+            self._pending += 1
+        self._executor.submit(self._run, flight)
+        return flight, False
+
+    def _run(self, flight):
+        with self._lock:
+            self._running += 1
+        try:
+            if flight.cancel_event.is_set():
+                # Every request left while the flight was queued
+                flight.finish()
+            else:
+                flight.finish(fields=self.run(flight))
+        except Exception as e:
+            logging.exception(f"Analysis of {flight.key} failed")
+            flight.finish(error=e)
+        finally:
+            with self._lock:
+                self._running -= 1
+                self._pending -= 1
+                if self._flights.get(flight.key) is flight:
+                    del self._flights[flight.key]
+
+    def stats(self):
+        """
+        Returns:
+            dict: Numbers of analyses 'running' and 'queued'
+        """
+        with self._lock:
+            return {"running": self._running, "queued": self._pending - self._running}
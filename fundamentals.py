@@ -0,0 +1,120 @@
+import pandas as pd
+import numpy as np
+
+STATEMENT_COLUMNS = {
+    "balance_sheet": ["TotalDebt", "StockholdersEquity", "CurrentAssets", "CurrentLiabilities", "Inventory",
+                      "TotalAssets", "TotalLiabilitiesNetMinorityInterest", "CurrentDebt", "LongTermDebt"],
+    "cash_flow": ["OperatingCashFlow", "CapitalExpenditure"],
+    "income_statement": ["BasicEPS"],
+}
+# Metrics ranked within each sector, a percentile of 1.0 is the highest value in the sector
+PERCENTILE_METRICS = ["Debt-to-Equity", "Current Ratio", "Quick Ratio", "Free cash flow (FCF)", "EPS growth"]
+
+
+def stack_statements(companies_data):
+    """
+    Stacks the quarterly statements of many companies into one long frame.
+
+    Args:
+        companies_data (dict): Mapping of symbol to company data, as returned by get_companies_data
+
+    Returns:
+        DataFrame: One row per symbol and quarter with the columns of STATEMENT_COLUMNS
+    """
+    frames = []
+    for statement, columns in STATEMENT_COLUMNS.items():
+        parts = [data[statement] for data in companies_data.values()
+                 if isinstance(data.get(statement), pd.DataFrame) and not data[statement].empty]
+        if not parts:
+            frames.append(pd.DataFrame(columns=["symbol", "asOfDate"] + columns))
+            continue
+        stacked = pd.concat(parts).reset_index()
+        stacked = stacked[stacked["periodType"] != "TTM"]
+        frames.append(stacked.reindex(columns=["symbol", "asOfDate"] + columns))
+
+    long_frame = frames[0]
+    for frame in frames[1:]:
+        long_frame = long_frame.merge(frame, on=["symbol", "asOfDate"], how="outer")
+    return long_frame.sort_values(["symbol", "asOfDate"], ignore_index=True)
+
+
+def compute_universe_metrics(long_frame):
+    """
+    Computes the ratios of compute_financial_metrics and EPS trends for every symbol and quarter at once.
+
+    Args:
+        long_frame (DataFrame): Output of stack_statements
+
+    Returns:
+        DataFrame: One row per symbol and quarter with debt, liquidity, cash flow and EPS metrics
+    """
+    f = long_frame
+    metrics = pd.DataFrame({
+        "symbol": f["symbol"],
+        "asOfDate": f["asOfDate"],
+        "Debt-to-Equity": f["TotalDebt"] / f["StockholdersEquity"],
+        "Current Ratio": f["CurrentAssets"] / f["CurrentLiabilities"],
+        "Quick Ratio": (f["CurrentAssets"] - f["Inventory"]) / f["CurrentLiabilities"],
+        "Total assets": f["TotalAssets"],
+        "liabilities": f["TotalLiabilitiesNetMinorityInterest"],
+        "Free cash flow (FCF)": f["OperatingCashFlow"] - f["CapitalExpenditure"],
+        "operating cash flow": f["OperatingCashFlow"],
+        "Short-Term Debt": f["CurrentDebt"],
+        "Long-Term Debt": f["LongTermDebt"],
+        "Total Debt": f["CurrentDebt"] + f["LongTermDebt"],
+        "BasicEPS": f["BasicEPS"],
+    })
+    metrics = metrics.replace([np.inf, -np.inf], np.nan)
+    eps = metrics.dropna(subset=["BasicEPS"]).groupby("symbol")["BasicEPS"]
+    metrics["EPS growth"] = eps.pct_change()
+    metrics["EPS trend"] = np.sign(eps.diff())
+    return metrics
+
+
+def latest_metrics(metrics):
+    """
+    Reduces per-quarter metrics to the most recent non-missing value of each metric per symbol.
+
+    Args:
+        metrics (DataFrame): Output of compute_universe_metrics
+
+    Returns:
+        DataFrame: One row per symbol, indexed by symbol
+    """
+    return metrics.sort_values(["symbol", "asOfDate"]).groupby("symbol").last()
+
+
+def sector_percentiles(latest, sectors, columns=None):
+    """
+    Ranks each symbol's metrics against the other symbols of its sector.
+
+    Args:
+        latest (DataFrame): Output of latest_metrics
+        sectors (dict): Mapping of symbol to sector
+        columns (list, optional): Metrics to rank. Defaults to PERCENTILE_METRICS.
+
+    Returns:
+        DataFrame: Percentile ranks in (0, 1], indexed by symbol, with '<metric> pct' columns
+    """
+    columns = columns or PERCENTILE_METRICS
+    sector = pd.Series(sectors, name="sector").reindex(latest.index)
+    ranks = latest[columns].groupby(sector).rank(pct=True)
+    return ranks.add_suffix(" pct")
+
+
+def screen_universe(companies_data):
+    """
+    Computes the latest fundamentals and their sector percentiles for a whole universe.
+
+    Args:
+        companies_data (dict): Mapping of symbol to company data, as returned by get_companies_data
+
+    Returns:
+        DataFrame: One row per symbol with sector, latest metrics and sector percentiles
+    """
+    latest = latest_metrics(compute_universe_metrics(stack_statements(companies_data)))
+    sectors = {symbol: (data.get("assetProfile") or {}).get("sector", "N/A")
+               for symbol, data in companies_data.items() if isinstance(data.get("assetProfile"), dict)}
+    result = latest.join(sector_percentiles(latest, sectors))
+    result.insert(0, "sector", pd.Series(sectors).reindex(result.index).fillna("N/A"))
+    return result
@@ -0,0 +1,280 @@
+from collections import deque
+import tempfile
+import math
+import pickle
+import os
+import logging
+
+VOLATILITY_WINDOW = 30
+SMA_WINDOWS = (50, 200)
+TRADING_DAYS = 252
+# Indicator columns of process_historical_data, stored per bar after the bar's day number
+COLUMNS = ["daily_return", "rolling_volatility"] + [f"SMA_{window}" for window in SMA_WINDOWS]
+
+
+class RollingMean:
+    """
+    Mean over the last `window` values, updated in O(1) with a running sum.
+    """
+
+    def __init__(self, window, values=(), total=None):
+        """
+        Args:
+            window (int): Number of values
+            values (iterable, optional): Initial values, pushed in order
+            total (float, optional): Running sum of `values`, restored as is instead of pushing them
+        """
+        self.window = window
+        self.values = deque(maxlen=window)
+        self.total = 0.0
+        if total is not None:
+            self.values.extend(values)
+            self.total = total
+            return
+        for value in values:
+            self.push(value)
+
+    def push(self, value):
+        if len(self.values) == self.window:
+            self.total -= self.values[0]
+        self.values.append(value)
+        self.total += value
+        return self.value()
+
+    def value(self):
+        if len(self.values) < self.window:
+            return math.nan
+        return self.total / self.window
+
+
+class RollingStd:
+    """
+    Sample standard deviation over the last `window` values, updated in O(1) with Welford's algorithm.
+    """
+
+    def __init__(self, window, values=(), mean=None, m2=None):
+        """
+        Args:
+            window (int): Number of values
+            values (iterable, optional): Initial values, pushed in order
+            mean (float, optional): Welford mean of `values`, restored with `m2` instead of pushing them
+            m2 (float, optional): Welford sum of squared deviations of `values`
+        """
+        self.window = window
+        self.values = deque(maxlen=window)
+        self.mean = 0.0
+        self.m2 = 0.0
+        if mean is not None:
+            self.values.extend(values)
+            self.mean, self.m2 = mean, m2
+            return
+        for value in values:
+            self.push(value)
+
+    def push(self, value):
+        if len(self.values) == self.window:
+            old = self.values[0]
+            count = len(self.values) - 1
+            delta = old - self.mean
+            self.mean = self.mean - delta / count if count else 0.0
+            self.m2 = max(self.m2 - delta * (old - self.mean), 0.0) if count else 0.0
+        self.values.append(value)
+        count = len(self.values)
+        delta = value - self.mean
+        self.mean += delta / count
+        self.m2 += delta * (value - self.mean)
+        return self.value()
+
+    def value(self):
+        if len(self.values) < self.window:
+            return math.nan
+        return math.sqrt(self.m2 / (self.window - 1))
+
+
+class IndicatorEngine:
+    """
+    Computes the indicators of process_historical_data incrementally for one symbol.
+
+    Two files per symbol are kept under data/indicators: {symbol}.pkl holds the rolling windows,
+    their running sums and Welford accumulators, and the last date and close; {symbol}.f64 holds
+    the indicator COLUMNS of every committed bar, one row of float64 values per bar, appended to
+    as bars arrive. An update reads the columns of bars it has already seen instead of
+    recomputing them and only pushes the bars newer than the state, so its work depends on the
+    number of new bars. The most recent bar of every update is treated as provisional (it may
+    be an unfinished trading day) and is recomputed on the next update instead of being committed.
+    """
+
+    def __init__(self, symbol, directory="data/indicators"):
+        """
+        Args:
+            symbol (str): Stock symbol of the company
+            directory (str, optional): Where the state is persisted. Defaults to data/indicators.
+        """
+        self.symbol = symbol
+        self.directory = directory
+        self.path = os.path.join(directory, f"{symbol}.pkl")
+        self.columns_path = os.path.join(directory, f"{symbol}.f64")
+        self.reset()
+        self.load()
+
+    def reset(self):
+        self.last_date = None
+        self.last_close = None
+        self.volatility = RollingStd(VOLATILITY_WINDOW)
+        self.smas = {window: RollingMean(window) for window in SMA_WINDOWS}
+        # Bars whose columns are committed to the columns file
+        self.rows = 0
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "rb") as file:
+                state = pickle.load(file)
+            volatility = RollingStd(VOLATILITY_WINDOW, state["returns"], state["mean"], state["m2"])
+            smas = {window: RollingMean(window, state["closes"][-window:], state["totals"][window])
+                    for window in SMA_WINDOWS}
+            if os.path.getsize(self.columns_path) < state["rows"] * (1 + len(COLUMNS)) * 8:
+                raise ValueError("the columns file is shorter than the state")
+        except Exception as e:
+            # Also covers states of earlier layouts, which are rebuilt from the input
+            logging.warning(f"Ignoring unreadable indicator state for {self.symbol}: {e}")
+            return
+        self.last_date = state["last_date"]
+        self.last_close = state["last_close"]
+        self.volatility = volatility
+        self.smas = smas
+        self.rows = state["rows"]
+
+    def read_columns(self):
+        """
+        Returns:
+            ndarray: (rows, 1 + len(COLUMNS)) array of the committed bars: day number since 1970-01-01, then COLUMNS
+        """
+        import numpy as np
+
+        width = 1 + len(COLUMNS)
+        if not self.rows:
+            return np.empty((0, width))
+        return np.fromfile(self.columns_path, dtype=np.float64, count=self.rows * width).reshape(-1, width)
+
+    def save(self, committed):
+        """
+        Appends the columns of newly committed bars and saves the state.
+
+        Args:
+            committed (list): Rows of read_columns for the bars pushed since the state was loaded
+        """
+        import numpy as np
+
+        os.makedirs(self.directory, exist_ok=True)
+        # Rows are written at the offset the loaded state ends at, so a concurrent update of the
+        # symbol from the same state writes the same rows instead of appending them twice
+        with open(self.columns_path, "r+b" if os.path.exists(self.columns_path) else "wb") as file:
+            file.seek(self.rows * (1 + len(COLUMNS)) * 8)
+            np.asarray(committed, dtype=np.float64).tofile(file)
+            file.truncate()
+        self.rows += len(committed)
+        state = {
+            "last_date": self.last_date,
+            "last_close": self.last_close,
+            "returns": list(self.volatility.values),
+            "mean": self.volatility.mean,
+            "m2": self.volatility.m2,
+            "closes": list(self.smas[max(SMA_WINDOWS)].values),
+            "totals": {window: sma.total for window, sma in self.smas.items()},
+            "rows": self.rows,
+        }
+        # A file of its own per writer, so concurrent updates of the symbol do not mix their states
+        with tempfile.NamedTemporaryFile("wb", dir=self.directory, prefix=f"{self.symbol}.", suffix=".tmp",
+                                         delete=False) as file:
+            pickle.dump(state, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(file.name, self.path)
+
+    def copy(self):
+        """
+        Returns:
+            IndicatorEngine: An unsaved engine with a copy of the state, e.g. to push a provisional bar
+        """
+        engine = IndicatorEngine.__new__(IndicatorEngine)
+        engine.symbol, engine.directory = self.symbol, self.directory
+        engine.path, engine.columns_path, engine.rows = self.path, self.columns_path, self.rows
+        engine.last_date = self.last_date
+        engine.last_close = self.last_close
+        engine.volatility = RollingStd(VOLATILITY_WINDOW, self.volatility.values, self.volatility.mean,
+                                       self.volatility.m2)
+        engine.smas = {window: RollingMean(window, sma.values, sma.total) for window, sma in self.smas.items()}
+        return engine
+
+    def push(self, date, close):
+        """
+        Adds one daily bar to the state.
+
+        Args:
+            date (date): Bar date
+            close (float): Closing price
+
+        Returns:
+            list: Values of COLUMNS for the bar
+        """
+        if self.last_close is None:
+            daily_return = volatility = math.nan
+        else:
+            daily_return = close / self.last_close - 1
+            volatility = self.volatility.push(daily_return) * (TRADING_DAYS ** 0.5)
+        self.last_date = date
+        self.last_close = close
+        return [daily_return, volatility] + [sma.push(close) for sma in self.smas.values()]
+
+    def update(self, real_historical_data):
+        """
+        Pushes the bars newer than the persisted state and saves the state if it changed.
+
+        Args:
+            real_historical_data (DataFrame): Raw historical price data as returned by get_company_data
+
+        Returns:
+            DataFrame: The input bars with the columns of process_historical_data
+        """
+        import numpy as np
+        import pandas as pd
+
+        # Built column by column and wrapped in one DataFrame at the end, since inserting columns
+        # into a frame costs more than the indicators of a few new bars
+        keep = real_historical_data["close"].notna().to_numpy()
+        columns = {name: real_historical_data[name].to_numpy()[keep] for name in real_historical_data.columns}
+        stamps = pd.to_datetime(pd.Series(columns["date"]), utc=True).dt.tz_convert(None)
+        days = stamps.to_numpy().astype("datetime64[D]").astype(np.int64)
+        columns["date"] = stamps.dt.date.to_numpy()
+        dates = columns["date"].tolist()
+        closes = columns["close"].astype(np.float64)
+        values = np.full((len(closes), len(COLUMNS)), np.nan)
+
+        first_new = 0
+        if self.last_date is not None and len(closes):
+            stored = self.read_columns()
+            first_new = int(np.searchsorted(days, stored[-1, 0], side="right"))
+            positions = np.searchsorted(stored[:, 0], days[:first_new])
+            if (first_new == 0 or dates[first_new - 1] != self.last_date
+                    or not math.isclose(closes[first_new - 1], self.last_close, rel_tol=1e-6)
+                    or positions.max() >= len(stored) or (stored[positions, 0] != days[:first_new]).any()):
+                # The input does not continue the state, or prices were adjusted (e.g. after a split)
+                logging.info(f"Price history of {self.symbol} does not match its indicator state, recomputing")
+                self.reset()
+                first_new = 0
+            else:
+                values[:first_new] = stored[positions, 1:]
+
+        committed = []
+        for i in range(first_new, len(closes) - 1):
+            values[i] = self.push(dates[i], closes[i])
+            committed.append([days[i], *values[i]])
+        if committed:
+            self.save(committed)
+        if first_new < len(closes):
+            # The provisional last bar is pushed on a copy of the state so it is not committed
+            values[-1] = self.copy().push(dates[-1], closes[-1])
+        logging.debug(f"Processed {len(closes) - first_new} new bars for {self.symbol}")
+
+        columns.update({column: values[:, i] for i, column in enumerate(COLUMNS)})
+        return pd.DataFrame(columns, copy=False)
@@ -0,0 +1,228 @@
+from contextlib import contextmanager
+from collections import defaultdict
+import contextvars
+import functools
+import threading
+import logging
+import time
+import os
+
+# Upper bounds in seconds of the latency histogram buckets
+BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+# Duration and count fields Ollama returns with a completed generation
+OLLAMA_FIELDS = ("total_duration", "load_duration", "prompt_eval_count", "prompt_eval_duration",
+                 "eval_count", "eval_duration")
+
+_HELP = {
+    "analysis_stage_seconds": ("histogram", "Wall-clock seconds spent per pipeline stage"),
+    "ollama_prompt_eval_seconds": ("histogram", "Seconds Ollama spent evaluating an agent prompt"),
+    "ollama_eval_seconds": ("histogram", "Seconds Ollama spent generating an agent answer"),
+    "ollama_prompt_eval_tokens_total": ("counter", "Prompt tokens evaluated by Ollama"),
+    "ollama_eval_tokens_total": ("counter", "Tokens generated by Ollama"),
+    "ollama_load_seconds_total": ("counter", "Seconds Ollama spent loading the model"),
+    "ollama_cached_responses_total": ("counter", "Agent answers served from the LLM response cache"),
+    "agent_escalations_total": ("counter", "Agent answers rerun on the escalation model after failing their check"),
+    "api_generate_requests_total": ("counter", "Analysis requests that started an analysis, attached to one in "
+                                               "progress or were rejected because the queue was full"),
+}
+
+_lock = threading.Lock()
+_histograms = {}
+_counters = defaultdict(float)
+_current_run = contextvars.ContextVar("current_run", default=None)
+
+
+def configure_logging():
+    """
+    Configures the root logger of an entry point from the LOGGING_LEVEL setting, INFO by default.
+    """
+    logging.basicConfig(
+        level=int(os.getenv("LOGGING_LEVEL", logging.INFO)),
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+        datefmt="%Y-%m-%d %H:%M:%S"
+    )
+    logging.getLogger("urllib3").setLevel(logging.ERROR)
+
+
+class RunStats:
+    """
+    Stage timings and Ollama counters of a single analysis, e.g. one /api/generate request.
+    """
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.stages = defaultdict(float)
+        self.ollama = dict.fromkeys(OLLAMA_FIELDS, 0)
+        self._lock = threading.Lock()
+
+    def add_stage(self, name, seconds):
+        with self._lock:
+            self.stages[name] += seconds
+
+    def add_ollama(self, response):
+        with self._lock:
+            for field in OLLAMA_FIELDS:
+                self.ollama[field] += response.get(field) or 0
+
+    def response_fields(self):
+        """
+        Returns:
+            dict: Ollama's duration (nanoseconds) and count fields summed over all agents, with
+                total_duration being the wall-clock time of the run, plus seconds per stage
+        """
+        with self._lock:
+            fields = dict(self.ollama)
+            fields["total_duration"] = int((time.perf_counter() - self.start) * 1e9)
+            fields["stages"] = {name: round(seconds, 3) for name, seconds in self.stages.items()}
+        return fields
+
+
+def observe(name, value, **labels):
+    """
+    Adds a value to a histogram.
+
+    Args:
+        name (str): Metric name
+        value (float): Observed value in seconds
+        **labels: Prometheus labels
+    """
+    key = (name, tuple(sorted(labels.items())))
+    with _lock:
+        histogram = _histograms.setdefault(key, {"buckets": [0] * len(BUCKETS), "sum": 0.0, "count": 0})
+        for i, bound in enumerate(BUCKETS):
+            if value <= bound:
+                histogram["buckets"][i] += 1
+        histogram["sum"] += value
+        histogram["count"] += 1
+
+
+def increment(name, value=1, **labels):
+    """
+    Adds a value to a counter.
+
+    Args:
+        name (str): Metric name
+        value (float, optional): Amount to add. Defaults to 1.
+        **labels: Prometheus labels
+    """
+    with _lock:
+        _counters[(name, tuple(sorted(labels.items())))] += value
+
+
+@contextmanager
+def track_run():
+    """
+    Collects the stages and Ollama counters of the code run inside the block into a RunStats.
+
+    Yields:
+        RunStats: Stats of the run, filled in as stages complete
+    """
+    stats = RunStats()
+    previous = _current_run.get()
+    _current_run.set(stats)
+    try:
+        yield stats
+    finally:
+        _current_run.set(previous)
+
+
+def current_context():
+    """
+    Returns:
+        Context: Copy of the current context, to run work on another thread as part of the same run
+    """
+    return contextvars.copy_context()
+
+
+@contextmanager
+def stage(name):
+    """
+    Times the block as a pipeline stage.
+
+    Args:
+        name (str): Stage name, e.g. get_company_data or an agent name
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        observe("analysis_stage_seconds", seconds, stage=name)
+        run = _current_run.get()
+        if run is not None:
+            run.add_stage(name, seconds)
+
+
+def timed(name):
+    """
+    Decorator timing every call of a function as a pipeline stage.
+
+    Args:
+        name (str): Stage name
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def record_ollama(agent, response):
+    """
+    Records the counters of a completed Ollama generation.
+
+    Args:
+        agent (str): Agent the generation belongs to
+        response (dict): Ollama's final response or chunk
+    """
+    if response.get("cached"):
+        increment("ollama_cached_responses_total", agent=agent)
+        return
+    observe("ollama_prompt_eval_seconds", (response.get("prompt_eval_duration") or 0) / 1e9, agent=agent)
+    observe("ollama_eval_seconds", (response.get("eval_duration") or 0) / 1e9, agent=agent)
+    increment("ollama_prompt_eval_tokens_total", response.get("prompt_eval_count") or 0, agent=agent)
+    increment("ollama_eval_tokens_total", response.get("eval_count") or 0, agent=agent)
+    increment("ollama_load_seconds_total", (response.get("load_duration") or 0) / 1e9, agent=agent)
+    run = _current_run.get()
+    if run is not None:
+        run.add_ollama(response)
+
+
+def _format_labels(labels, extra=()):
+    labels = tuple(labels) + tuple(extra)
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in labels) + "}"
+
+
+def render_prometheus():
+    """
+    Renders all metrics in the Prometheus text exposition format.
+
+    Returns:
+        str: Metrics text
+    """
+    with _lock:
+        histograms = {key: {**value, "buckets": list(value["buckets"])} for key, value in _histograms.items()}
+        counters = dict(_counters)
+
+    lines = []
+    names = sorted({name for name, _ in histograms} | {name for name, _ in counters})
+    for name in names:
+        metric_type, help_text = _HELP.get(name, ("untyped", name))
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {metric_type}")
+        for (metric, labels), histogram in sorted(histograms.items()):
+            if metric != name:
+                continue
+            for bound, count in zip(BUCKETS, histogram["buckets"]):
+                lines.append(f"{name}_bucket{_format_labels(labels, [('le', bound)])} {count}")
+            lines.append(f"{name}_bucket{_format_labels(labels, [('le', '+Inf')])} {histogram['count']}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {histogram['sum']}")
+            lines.append(f"{name}_count{_format_labels(labels)} {histogram['count']}")
+        for (metric, labels), value in sorted(counters.items()):
+            if metric == name:
+                lines.append(f"{name}{_format_labels(labels)} {value}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,114 @@
+from cache import SQLiteCache
+from contextlib import closing
+import threading
+import hashlib
+import json
+import time
+import os
+import logging
+
+
+class CachedLLM:
+    """
+    Caches the responses of an OllamaClient on disk, keyed by model, options, context and prompt.
+
+    Identical prompts, e.g. the same symbol analyzed from the Streamlit app and the Flask API
+    on the same day, are answered from the cache instead of being generated again.
+    """
+
+    def __init__(self, client, path=None, max_bytes=None, ttl=None, bypass=None):
+        """
+        Args:
+            client (OllamaClient): Client used on cache misses
+            path (str, optional): Cache file. Defaults to LLM_CACHE_PATH or data/llm_cache.sqlite.
+            max_bytes (int, optional): Size bound of the cache. Defaults to LLM_CACHE_MAX_BYTES or 64 MB.
+            ttl (float, optional): Seconds for which a response is reused. Defaults to LLM_CACHE_TTL or one day.
+            bypass (bool, optional): Always call the client and only store its responses.
+                Defaults to LLM_CACHE_BYPASS.
+        """
+        self.client = client
+        self.cache = SQLiteCache(path or os.getenv("LLM_CACHE_PATH", "data/llm_cache.sqlite"),
+                                 max_bytes=max_bytes or int(os.getenv("LLM_CACHE_MAX_BYTES", 64 * 1024 * 1024)))
+        self.ttl = ttl if ttl is not None else float(os.getenv("LLM_CACHE_TTL", 24 * 3600))
+        self.bypass = bypass if bypass is not None else os.getenv("LLM_CACHE_BYPASS", "0") == "1"
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @property
+    def model(self):
+        return self.client.model
+
+    def key(self, prompt, context=None, options=None):
+        """
+        Computes the content address of a request.
+
+        Args:
+            prompt (str): Fully rendered prompt
+            context (list, optional): Ollama context the prompt continues from
+            options (dict, optional): Model options for this request
+
+        Returns:
+            str: SHA-256 hex digest
+        """
+        options = {**self.client.options, **(options or {})}
+        payload = json.dumps([self.client.model, options, context or [], prompt], sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _lookup(self, key):
+        if self.bypass:
+            return None
+        value, state = self.cache.lookup(key, self.ttl)
+        with self._lock:
+            if state == "fresh":
+                self.hits += 1
+            else:
+                self.misses += 1
+        return value
+
+    def stats(self):
+        """
+        Returns:
+            dict: Hit and miss counters since start-up and the current cache size in bytes
+        """
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        return {"hits": hits, "misses": misses, "size_bytes": self.cache.total_size()}
+
+    def generate(self, prompt, context=None, options=None):
+        key = self.key(prompt, context, options)
+        result = self._lookup(key)
+        if result is not None:
+            logging.debug(f"LLM cache hit {key[:12]}")
+            return {**result, "cached": True}
+        start = time.perf_counter()
+        result = self.client.generate(prompt, context=context, options=options)
+        logging.debug(f"LLM cache miss {key[:12]}, generated in {time.perf_counter() - start:.1f}s")
+        self.cache.set(key, result)
+        return result
+
+    def generate_stream(self, prompt, context=None, options=None):
+        key = self.key(prompt, context, options)
+        result = self._lookup(key)
+        if result is not None:
+            logging.debug(f"LLM cache hit {key[:12]}")
+            yield {**result, "done": False, "context": None, "cached": True}
+            yield {**result, "response": "", "done": True, "cached": True}
+            return
+
+        response_text = ""
+        with closing(self.client.generate_stream(prompt, context=context, options=options)) as stream:
+            for chunk in stream:
+                response_text += chunk.get("response", "")
+                if chunk.get("done"):
+                    # Only complete responses are stored, an abandoned stream leaves the cache untouched
+                    self.cache.set(key, {**chunk, "response": response_text})
+                yield chunk
+
+    def invoke(self, prompt):
+        return self.generate(prompt)["response"]
+
+    def stream(self, prompt):
+        for chunk in self.generate_stream(prompt):
+            if chunk.get("response"):
+                yield chunk["response"]
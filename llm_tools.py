@@ -1,9 +1,69 @@
-from langchain_community.llms import Ollama
+from concurrent.futures import CancelledError, Future, ThreadPoolExecutor
+from contextlib import closing
+import tempfile
+import queue
 import re
 from utils import *
+from llm_cache import CachedLLM
+from model_router import ModelRouter, check_answer
+from instrumentation import current_context, increment, record_ollama, stage, timed
+from prompt_encoding import TOKEN_BUDGETS, estimate_tokens, encode_eps_trend, encode_financial_metrics, encode_history
 
-llm = Ollama(model="deepseek-r1:1.5b")
-all_comps = get_top_n_companies(250)
+
+def create_llm(model="deepseek-r1:1.5b", backend=None):
+    """
+    Creates the LLM backend the agents run on, wrapped in the response cache.
+
+    Args:
+        model (str, optional): Model name. Defaults to deepseek-r1:1.5b.
+        backend (str, optional): 'ollama' or 'fake' (deterministic, no server needed).
+            Defaults to LLM_BACKEND or 'ollama'.
+
+    Returns:
+        CachedLLM: Backend with generate, generate_stream, invoke and stream
+    """
+    backend = backend or os.getenv("LLM_BACKEND", "ollama")
+    # Imported with the first client, which the router only creates when an agent runs
+    if backend == "ollama":
+        from ollama_client import OllamaClient
+
+        return CachedLLM(OllamaClient(model=model))
+    if backend == "fake":
+        from fake_llm import FakeLLM
+
+        return CachedLLM(FakeLLM(model=model))
+    raise ValueError(f"Unknown LLM backend: {backend}")
+
+
+# Every agent runs on the model assigned to it in AGENT_MODELS, see model_router
+router = ModelRouter(create_llm)
+all_comps = universe
+
+# Agents in the order of the messages returned by build_prompts
+AGENTS = ["company-overview-agent", "health-check-agent", "financial-stability-agent", "valuation-agent",
+          "market-sentiment-agent", "decision-making-agent"]
+# Agents whose answers must be in an agent's memory before it runs; agents not listed run independently
+AGENT_DEPENDENCIES = {
+    "decision-making-agent": ["company-overview-agent", "health-check-agent", "financial-stability-agent",
+                              "valuation-agent", "market-sentiment-agent"],
+}
+# Placeholders each prompt is rendered with, checked against prompts.yaml at import
+PROMPT_FIELDS = {
+    "memory": {"memory"},
+    "company-overview-agent": {"symbol", "industry", "sector", "current_stock_price", "market_cap", "trend"},
+    "health-check-agent": {"revenue", "net_income", "eps_trends", "ebitda", "operating_margin", "profit_margin"},
+    "financial-stability-agent": {"input"},
+    "valuation-agent": {"pe_ratio_trailing", "pe_ratio_forward", "pb_ratio", "peg_ratio", "ev_ebitda",
+                        "dividend_yield", "market_cap"},
+    "market-sentiment-agent": {"analyst_rate", "hist_data", "sentiment"},
+    "decision-making-agent": set(),
+}
+prompts.validate(PROMPT_FIELDS)
+# 'sequential' runs every agent in order with all previous answers as memory,
+# 'parallel' runs agents concurrently as soon as their dependencies have finished,
+# 'session' runs every agent in order, continuing from Ollama's context instead of re-sending the memory
+AGENT_MODE = os.getenv("AGENT_MODE", "sequential")
+AGENT_CONCURRENCY = int(os.getenv("AGENT_CONCURRENCY", 5))
 
 
 def remove_think(text_lst):
@@ -22,51 +82,379 @@ def remove_think(text_lst):
     return result
 
 
-def analyze(messages: list):
+class ThinkFilter:
+    """
+    Splits a token stream into answer and <think> reasoning text as chunks arrive.
+
+    Each chunk is scanned once; only a possible partial tag at its end (at most 7 characters)
+    is held back until the next chunk, so tags split across tokens are still recognised.
+    A <think> block that is never closed counts as reasoning up to the end of the stream.
+    """
+
+    OPEN = "<think>"
+    CLOSE = "</think>"
+
+    def __init__(self):
+        self.thinking = False
+        self._pending = ""
+
+    def _emit(self, parts, text):
+        if text:
+            parts.append(("thinking" if self.thinking else "answer", text))
+
+    def feed(self, chunk):
+        """
+        Args:
+            chunk (str): Next piece of the LLM response
+
+        Returns:
+            list: (channel, text) pairs where channel is 'answer' or 'thinking', tags left out
+        """
+        text = self._pending + chunk
+        self._pending = ""
+        parts = []
+        while text:
+            tag = self.CLOSE if self.thinking else self.OPEN
+            index = text.find(tag)
+            if index >= 0:
+                self._emit(parts, text[:index])
+                text = text[index + len(tag):]
+                self.thinking = not self.thinking
+                continue
+            # Hold back the longest suffix that could be the start of the tag
+            keep = next((k for k in range(min(len(text), len(tag) - 1), 0, -1) if text.endswith(tag[:k])), 0)
+            self._emit(parts, text[:len(text) - keep])
+            self._pending = text[len(text) - keep:]
+            break
+        return parts
+
+    def flush(self):
+        """
+        Returns:
+            list: (channel, text) pairs of the text held back at the end of the stream
+        """
+        parts = []
+        self._emit(parts, self._pending)
+        self._pending = ""
+        return parts
+
+
+def _start_agent_graph(messages, run_agent, max_concurrency):
+    """
+    Starts agents on a thread pool as soon as the agents they depend on have finished.
+
+    Args:
+        messages (list): Prompts in the order of AGENTS
+        run_agent (callable): Called as run_agent(agent, prompt) on a worker thread, returns the answer
+        max_concurrency (int): Maximum number of agents running at the same time
+
+    Returns:
+        tuple: (pool, futures) where futures maps each agent to a Future of its answer with thinking removed
+    """
+    agents = AGENTS[:len(messages)]
+    dependencies = {agent: [dep for dep in AGENT_DEPENDENCIES.get(agent, []) if dep in agents] for agent in agents}
+    if all(dependencies[agent] for agent in agents):
+        raise ValueError("Agent dependencies contain a cycle, no agent can start")
+    futures = {agent: Future() for agent in agents}
+    started = set()
+    lock = threading.Lock()
+    pool = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="agent")
+
+    def run(agent, message):
+        try:
+            deps = dependencies[agent]
+            prompt = message
+            if deps:
+                prompt = prompts.with_memory(agent, message, [futures[dep].result() for dep in deps])
+            futures[agent].set_result(remove_think([run_agent(agent, prompt)])[0])
+        except BaseException as e:
+            futures[agent].set_exception(e)
+        submit_ready()
+
+    def submit_ready():
+        with lock:
+            ready = [agent for agent in agents
+                     if agent not in started and all(futures[dep].done() for dep in dependencies[agent])]
+            started.update(ready)
+        for agent in ready:
+            try:
+                pool.submit(current_context().run, run, agent, messages[agents.index(agent)])
+            except RuntimeError:
+                # The pool was shut down because the caller stopped consuming results
+                return
+
+    submit_ready()
+    return pool, futures
+
+
+def _route(agent, model, prompt, session=None, memory=None):
+    """
+    Prepares an agent's request for a model.
+
+    In session mode, agents on the default model continue from the session's Ollama context.
+    A context cannot be continued by another model, so agents on other models get the
+    previous answers as memory instead.
+
+    Returns:
+        tuple: (client, prompt, context)
+    """
+    if session is not None and model == router.default_model and session.get("context"):
+        return router.client(model), prompt, session["context"]
+    if memory:
+        prompt = prompts.with_memory(agent, prompt, memory)
+    return router.client(model), prompt, None
+
+
+def _escalate(agent, model, next_model, problems):
+    logging.warning(f"{agent} answer from {model} failed the check ({'; '.join(problems)}), rerunning on {next_model}")
+    increment("agent_escalations_total", agent=agent, model=next_model)
+
+
+def generate_answer(agent, prompt, session=None, memory=None):
+    """
+    Runs an agent on its model and reruns it once on the escalation model if the answer
+    fails the agent's structural check (see model_router.check_answer).
+
+    Args:
+        agent (str): Agent name
+        prompt (str): Agent prompt from build_prompts
+        session (dict, optional): In session mode, 'context' is the default model's Ollama context,
+            continued from and updated in place
+        memory (list, optional): Previous answers, added to the prompt when no context is continued
+
+    Returns:
+        str: The answer with thinking removed
+    """
+    models = router.models_for(agent)
+    for attempt, model in enumerate(models):
+        client, request_prompt, context = _route(agent, model, prompt, session, memory)
+        with stage(agent):
+            result = client.generate(request_prompt, context=context)
+        record_ollama(agent, result)
+        logging.info(result["response"])
+        if session is not None and model == router.default_model:
+            session["context"] = result.get("context")
+        answer = remove_think([result["response"]])[0]
+        problems = check_answer(agent, answer)
+        if not problems or attempt == len(models) - 1:
+            return answer
+        _escalate(agent, model, models[attempt + 1], problems)
+
+
+def stream_answer(agent, prompt, session=None, memory=None, thinking=False, cancelled=None):
+    """
+    Streams an agent's answer like generate_answer does.
+
+    Reasoning between <think> tags is filtered out of the tokens as they arrive (see ThinkFilter).
+    When the answer fails its check the agent is rerun on the escalation model, after an
+    'agent_retry' event telling consumers to discard the tokens of the agent so far.
+
+    Args:
+        agent (str): Agent name
+        prompt (str): Agent prompt from build_prompts
+        session (dict, optional): See generate_answer
+        memory (list, optional): See generate_answer
+        thinking (bool, optional): Also yield the reasoning as 'thinking' events. Defaults to False.
+        cancelled (callable, optional): Returns True when generation should stop
+
+    Yields:
+        dict: {'event': 'token', 'agent', 'response'}, {'event': 'thinking', 'agent', 'thinking'}
+            and {'event': 'agent_retry', 'agent', 'model'}
+
+    Returns:
+        str: The answer with thinking removed, partial if cancelled
+    """
+    models = router.models_for(agent)
+    for attempt, model in enumerate(models):
+        client, request_prompt, context = _route(agent, model, prompt, session, memory)
+        answer = []
+        think_filter = ThinkFilter()
+
+        def to_events(parts):
+            for channel, text in parts:
+                if channel == "answer":
+                    answer.append(text)  # Accumulate the answer without thinking
+                    yield {"event": "token", "agent": agent, "response": text}
+                elif thinking:
+                    yield {"event": "thinking", "agent": agent, "thinking": text}
+
+        with stage(agent), closing(client.generate_stream(request_prompt, context=context)) as stream:
+            for chunk in stream:
+                if cancelled is not None and cancelled():
+                    return "".join(answer)
+                if chunk.get("done"):
+                    record_ollama(agent, chunk)
+                    if session is not None and model == router.default_model:
+                        session["context"] = chunk.get("context")
+                if chunk.get("response"):
+                    yield from to_events(think_filter.feed(chunk["response"]))
+        yield from to_events(think_filter.flush())
+
+        problems = check_answer(agent, "".join(answer))
+        if not problems or attempt == len(models) - 1:
+            return "".join(answer)
+        _escalate(agent, model, models[attempt + 1], problems)
+        yield {"event": "agent_retry", "agent": agent, "model": models[attempt + 1]}
+
+
+def analyze(messages: list, mode=None, max_concurrency=None, session=None):
     """
     Processes a list of messages through an LLM to analyze a company.
     
     Args:
-        messages (list): List of prompts/messages to process sequentially
+        messages (list): List of prompts/messages in the order of AGENTS
+        mode (str, optional): 'sequential', 'parallel' or 'session'. Defaults to AGENT_MODE.
+        max_concurrency (int, optional): Maximum number of agents running at the same time
+            in parallel mode. Defaults to AGENT_CONCURRENCY.
+        session (dict, optional): In session mode, 'context' is the Ollama context to continue
+            from and is updated in place with the context after the last agent
         
     Returns:
         list: Accumulated responses from the LLM with thinking tags removed
     """
+    mode = mode or AGENT_MODE
+    if mode == "parallel":
+        pool, futures = _start_agent_graph(messages, generate_answer, max_concurrency or AGENT_CONCURRENCY)
+        try:
+            return [future.result() for future in futures.values()]
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    # In session mode Ollama keeps the previous agents' prompts and answers in its context, so
+    # only the new agent prompt has to be evaluated. The context includes the thinking.
+    session = (session if session is not None else {}) if mode == "session" else None
     memory_buffer = []
-    for mes in messages:
-        memory = prompts['memory'].format(memory=remove_think(memory_buffer))
-        result = llm.invoke(memory + mes)
-        logging.info(result)
-        memory_buffer.extend(remove_think([result]))
+    for agent, mes in zip(AGENTS, messages):
+        # The answers in memory_buffer have their thinking removed already
+        memory_buffer.append(generate_answer(agent, mes, session=session, memory=memory_buffer))
 
     return memory_buffer
 
 
-def stream_analyze(messages: list):
+def stream_analyze_events(messages: list, mode=None, max_concurrency=None, session=None, cancel_event=None,
+                          thinking=False):
     """
-    Processes a list of messages through an LLM to analyze a company.
+    Processes a list of messages through an LLM and streams tokens with agent boundaries.
+
+    Reasoning between <think> tags is filtered out of the tokens as they arrive (see ThinkFilter).
+    In parallel mode the agents still stream in the order of AGENTS: tokens of agents
+    that run ahead are buffered until all earlier agents have been streamed. Generation
+    stops as soon as `cancel_event` is set or the generator is closed, and the Ollama
+    request in flight is closed so the server stops generating too.
 
     Args:
-        messages (list): List of prompts/messages to process sequentially
+        messages (list): List of prompts/messages in the order of AGENTS
+        mode (str, optional): 'sequential', 'parallel' or 'session'. Defaults to AGENT_MODE.
+        max_concurrency (int, optional): Maximum number of agents running at the same time
+            in parallel mode. Defaults to AGENT_CONCURRENCY.
+        session (dict, optional): In session mode, 'context' is the Ollama context to continue
+            from and is updated in place with the context after the last agent
+        cancel_event (threading.Event, optional): Set by the caller to stop generating
+        thinking (bool, optional): Also yield the reasoning as 'thinking' events. Defaults to False.
+
+    Yields:
+        dict: {'event': 'agent_start', 'agent'}, the events of stream_answer and
+            {'event': 'agent_end', 'agent', 'answer'} where answer has thinking tags removed
 
     Returns:
         list: Accumulated responses from the LLM with thinking tags removed
     """
+    mode = mode or AGENT_MODE
+    stop = threading.Event()
+
+    def cancelled():
+        return stop.is_set() or (cancel_event is not None and cancel_event.is_set())
+
+    if mode == "parallel":
+        done = object()
+        chunks = {agent: queue.Queue() for agent in AGENTS[:len(messages)]}
+
+        def run_agent(agent, prompt):
+            try:
+                if cancelled():
+                    raise CancelledError()
+                with closing(stream_answer(agent, prompt, thinking=thinking, cancelled=cancelled)) as events:
+                    while True:
+                        try:
+                            chunks[agent].put(next(events))
+                        except StopIteration as result:
+                            return result.value
+            finally:
+                chunks[agent].put(done)
+
+        pool, futures = _start_agent_graph(messages, run_agent, max_concurrency or AGENT_CONCURRENCY)
+        try:
+            for agent, future in futures.items():
+                yield {"event": "agent_start", "agent": agent}
+                while not cancelled():
+                    try:
+                        event = chunks[agent].get(timeout=0.1)
+                    except queue.Empty:
+                        if future.done() and future.exception():
+                            raise future.exception()
+                        continue
+                    if event is done:
+                        break
+                    yield event
+                if cancelled():
+                    return []
+                yield {"event": "agent_end", "agent": agent, "answer": future.result()}
+            return [future.result() for future in futures.values()]
+        finally:
+            stop.set()
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    # Only the session mode continues from Ollama's context, see analyze
+    session = (session if session is not None else {}) if mode == "session" else None
     memory_buffer = []
-    for mes in messages:
-        memory = prompts['memory'].format(memory=remove_think(memory_buffer))
-        stream = llm.stream(memory + mes)
+    try:
+        for agent, mes in zip(AGENTS, messages):
+            yield {"event": "agent_start", "agent": agent}
+            answer = yield from stream_answer(agent, mes, session=session, memory=memory_buffer,
+                                              thinking=thinking, cancelled=cancelled)
+            if cancelled():
+                return memory_buffer
 
-        response_text = ""
-        for chunk in stream:
-            response_text += chunk  # Accumulate chunks
-            yield chunk
+            memory_buffer.append(answer)
+            yield {"event": "agent_end", "agent": agent, "answer": answer}
+    finally:
+        stop.set()
 
-        memory_buffer.extend(remove_think([response_text]))
+    return memory_buffer
+
+
+def stream_analyze(messages: list, mode=None, max_concurrency=None, session=None, cancel_event=None):
+    """
+    Processes a list of messages through an LLM to analyze a company.
+
+    The tokens of an agent that is rerun on the escalation model are streamed for both attempts;
+    use stream_analyze_events to tell them apart.
+
+    Args:
+        messages (list): List of prompts/messages in the order of AGENTS
+        mode (str, optional): 'sequential', 'parallel' or 'session'. Defaults to AGENT_MODE.
+        max_concurrency (int, optional): Maximum number of agents running at the same time
+            in parallel mode. Defaults to AGENT_CONCURRENCY.
+        session (dict, optional): In session mode, 'context' is the Ollama context to continue
+            from and is updated in place with the context after the last agent
+        cancel_event (threading.Event, optional): Set by the caller to stop generating
+
+    Returns:
+        list: Accumulated responses from the LLM with thinking tags removed
+    """
+    memory_buffer = []
+    with closing(stream_analyze_events(messages, mode=mode, max_concurrency=max_concurrency, session=session,
+                                       cancel_event=cancel_event)) as events:
+        for event in events:
+            if event["event"] == "token":
+                yield event["response"]
+            elif event["event"] == "agent_end":
+                memory_buffer.append(event["answer"])
 
     return memory_buffer
 
 
+@timed("build_prompts")
 def build_prompts(comp_data, symbol):
     """
     Constructs a series of analysis prompts using company data.
@@ -80,7 +468,12 @@ def build_prompts(comp_data, symbol):
              financial stability, valuation, and market sentiment
     """
     data = comp_data[symbol]
-    raw_hist_data = process_historical_data(data['historical_price'])
+    raw_hist_data = process_historical_data(data['historical_price'], symbol)
+    # The EPS trend gets what the other health-check figures leave of the agent's budget
+    net_income = data['financialData']['totalRevenue'] * data['financialData']['profitMargins']
+    health_figures = [data['financialData']['totalRevenue'], net_income, data['financialData']['ebitda'],
+                      data['financialData']['operatingMargins'], data['financialData']['profitMargins']]
+    eps_budget = TOKEN_BUDGETS['health-check-agent'] - estimate_tokens(" ".join(map(str, health_figures)))
     messages = [
         prompts['company-overview-agent'].format(
             symbol=symbol + ':' + all_comps[symbol],
@@ -92,14 +485,15 @@ def build_prompts(comp_data, symbol):
         ),
         prompts['health-check-agent'].format(
             revenue=data['financialData']['totalRevenue'],
-            net_income=data['financialData']['totalRevenue'] * data['financialData']['profitMargins'],
-            eps_trends=get_eps_trend(data['income_statement']),
+            net_income=net_income,
+            eps_trends=encode_eps_trend(get_eps_trend(data['income_statement']), budget=max(eps_budget, 1)),
             ebitda=data['financialData']['ebitda'],
             operating_margin=data['financialData']['operatingMargins'],
             profit_margin=data['financialData']['profitMargins']
         ),
         prompts['financial-stability-agent'].format(
-            input=compute_financial_metrics(data['balance_sheet'], data['cash_flow'])
+            input=encode_financial_metrics(compute_financial_metrics(data['balance_sheet'], data['cash_flow']),
+                                           budget=TOKEN_BUDGETS['financial-stability-agent'])
         ),
         prompts['valuation-agent'].format(
             pe_ratio_trailing=data['summaryDetail']['trailingPE'],
@@ -112,7 +506,7 @@ def build_prompts(comp_data, symbol):
         ),
         prompts['market-sentiment-agent'].format(
             analyst_rate=data['recommendationTrend']['trend'][0],
-            hist_data=filter_financial_summary(raw_hist_data),
+            hist_data=encode_history(raw_hist_data, budget=TOKEN_BUDGETS['market-sentiment-agent']),
             sentiment=define_sentiment(raw_hist_data)
         ),
         # prompts['risk-analyze-agent'].format(
@@ -120,32 +514,61 @@ def build_prompts(comp_data, symbol):
         #     regulatory_risk="",
         #     macroeconomic=""
         # ),
-        prompts['decision-making-agent']
+        prompts['decision-making-agent'].format()
     ]
 
+    for agent, message in zip(AGENTS, messages):
+        tokens = estimate_tokens(message)
+        template_tokens = estimate_tokens(prompts[agent])
+        logging.debug(f"{symbol} {agent}: ~{tokens} prompt tokens")
+        if agent in TOKEN_BUDGETS and tokens - template_tokens > TOKEN_BUDGETS[agent]:
+            logging.warning(f"{symbol} {agent}: data uses ~{tokens - template_tokens} tokens, "
+                            f"over its budget of {TOKEN_BUDGETS[agent]}")
+
     return messages
 
 
-def analyze_comp(symbol):
+def analyze_comp(symbol, mode=None, session=None):
     """
     Overall function to analyze a company with given symbol.
     :param symbol: company symbol, e.g. AAPL
+    :param mode: 'sequential', 'parallel' or 'session' agent execution, defaults to AGENT_MODE
+    :param session: dict carrying the Ollama context in session mode, updated in place
     :return:
     """
     temp = get_company_data(symbol)
     messages = build_prompts(temp, symbol)
-    analysis = analyze(messages)
+    analysis = analyze(messages, mode=mode, session=session)
+    save_analysis(symbol, analysis)
+    return analysis
+
+
+def save_analysis(symbol, analysis):
+    """
+    Writes the agents' answers to ./data/{symbol}_analysis.md.
+
+    Args:
+        symbol (str): Company stock symbol
+        analysis (list): Answers returned by analyze
+    """
+    os.makedirs("data", exist_ok=True)
     with open(f"./data/{symbol}_analysis.md", "w") as file:
         file.write("\n".join(analysis))
-    return analysis
 
 
-def stream_analyze_comp(symbol):
+def stream_analyze_comp(symbol, mode=None, session=None, events=False, cancel_event=None, thinking=False):
     """
     Streams company analysis results instead of waiting for all responses.
 
     Args:
         symbol (str): Company stock symbol
+        mode (str, optional): 'sequential', 'parallel' or 'session' agent execution. Defaults to AGENT_MODE.
+        session (dict, optional): Carries the Ollama context in session mode, updated in place
+        events (bool, optional): Yield the event dicts of stream_analyze_events instead of tokens.
+            Defaults to False.
+        cancel_event (threading.Event, optional): Set by the caller to stop generating
+        thinking (bool, optional): With `events`, also yield the reasoning as 'thinking' events.
+            It is never written to the analysis file. Defaults to False.
 
     Yields:
         str: Streamed responses as they arrive
@@ -153,9 +576,27 @@ def stream_analyze_comp(symbol):
     temp = get_company_data(symbol)
     messages = build_prompts(temp, symbol)
 
-    with open(f"./data/{symbol}_analysis.md", "w") as file:
-        for response in stream_analyze(messages):
-            file.write(response + "\n")
-            yield response  # Stream each response
+    # Written to a file of this run and only moved over the report once every agent has answered,
+    # so a cancelled or failed run keeps the previous report
+    os.makedirs("data", exist_ok=True)
+    file = tempfile.NamedTemporaryFile("w", dir="data", prefix=f"{symbol}_analysis.", suffix=".tmp", delete=False)
+    try:
+        with file, closing(stream_analyze_events(messages, mode=mode, session=session, cancel_event=cancel_event,
+                                                 thinking=thinking and events)) as stream:
+            for event in stream:
+                if event["event"] == "agent_end":
+                    # Written once complete, since an escalated agent streams its answer twice
+                    file.write(event["answer"] + "\n")
+                if events:
+                    yield event
+                elif event["event"] == "token":
+                    yield event["response"]  # Stream each response
+        if cancel_event is not None and cancel_event.is_set():
+            logging.info(f"Analysis of {symbol} cancelled, keeping the previous report")
+            return
+        os.replace(file.name, f"./data/{symbol}_analysis.md")
+    finally:
+        if os.path.exists(file.name):
+            os.remove(file.name)
 
     logging.info(f"Analysis completed for {symbol}")
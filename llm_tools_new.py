@@ -3,7 +3,7 @@ import re
 from utils import *
 
 llm = Ollama(model="deepseek-r1:8b")
-all_comps = get_top_n_companies(250)
+all_comps = universe
 
 
 def remove_think(text_lst):
@@ -0,0 +1,310 @@
+"""
+Load-tests the HTTP API end to end: api.py is started on waitress against a local fake Ollama
+server and replayed market data, and concurrent clients send /api/generate requests, so the
+number of clients the service sustains can be measured without a GPU or network access.
+
+Record fixtures once with bench.py (needs network access):
+    python bench.py --record 250
+
+Ramp up the number of clients, with half of the requests streaming and most on a few hot symbols:
+    python loadtest.py --clients 1 4 16 64 --duration 60 --stream-ratio 0.5 --hot-ratio 0.8
+
+The fake Ollama server answers at --tokens-per-sec after --latency seconds, evaluating --ollama-parallel
+requests at once, like OLLAMA_NUM_PARALLEL.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+import subprocess
+import threading
+import argparse
+import platform
+import tempfile
+import random
+import math
+import socket
+import shutil
+import time
+import json
+import sys
+import os
+
+from bench import ROOT, git_commit
+
+
+def percentile(values, q):
+    """
+    Args:
+        values (list): Measurements
+        q (float): Percentile between 0 and 100
+
+    Returns:
+        float: The nearest-rank percentile, or None without measurements
+    """
+    if not values:
+        return None
+    values = sorted(values)
+    return values[max(0, math.ceil(q / 100 * len(values)) - 1)]
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_api(port, env, workdir, threads, timeout=30):
+    """
+    Starts api.py on waitress and waits until it answers.
+
+    Args:
+        port (int): Port to serve on
+        env (dict): Environment of the server
+        workdir (str): Working directory, where its caches and data are written
+        threads (int): Requests served at once
+        timeout (float, optional): Seconds to wait for the server. Defaults to 30.
+
+    Returns:
+        subprocess.Popen: The server process
+    """
+    import requests
+
+    process = subprocess.Popen([sys.executable, os.path.join(ROOT, "api.py"), "--host", "127.0.0.1",
+                                "--port", str(port), "--threads", str(threads)], env=env, cwd=workdir)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f"api.py exited with code {process.returncode}")
+        try:
+            requests.get(f"http://127.0.0.1:{port}/metrics", timeout=1)
+            return process
+        except requests.ConnectionError:
+            time.sleep(0.2)
+    process.terminate()
+    raise SystemExit(f"api.py did not answer within {timeout}s")
+
+
+def send_request(session, url, symbol, stream, timeout):
+    """
+    Sends one /api/generate request and reads the whole response.
+
+    Args:
+        session (requests.Session): Session of the client
+        url (str): Address of /api/generate
+        symbol (str): Symbol to analyze
+        stream (bool): Whether to stream the response
+        timeout (float): Seconds to wait for the server between two reads
+
+    Returns:
+        dict: status ('ok', 'rejected' or 'error'), HTTP code, seconds to the first token and to the end
+    """
+    start = time.perf_counter()
+    ttft = None
+    try:
+        with session.post(url, json={"model": "loadtest", "prompt": symbol, "stream": stream},
+                          stream=stream, timeout=timeout) as response:
+            code = response.status_code
+            if code == 200 and stream:
+                for line in response.iter_lines():
+                    chunk = json.loads(line)
+                    if "error" in chunk:
+                        code = 500
+                    # Agent boundaries and thinking carry no response, the first token does
+                    if ttft is None and chunk.get("response"):
+                        ttft = time.perf_counter() - start
+            else:
+                response.content
+    except Exception as e:
+        return {"status": "error", "code": None, "error": str(e), "ttft": None,
+                "latency": time.perf_counter() - start}
+    status = "ok" if code == 200 else "rejected" if code == 503 else "error"
+    return {"status": status, "code": code, "ttft": ttft, "latency": time.perf_counter() - start}
+
+
+def run_level(url, clients, symbols, duration=None, requests_count=None, stream_ratio=0.5, hot_ratio=0.8,
+              hot_symbols=1, timeout=600, seed=0):
+    """
+    Drives the API with a number of concurrent clients, each sending its next request once the
+    previous one completed.
+
+    Hot requests pick one of the first `hot_symbols` symbols, so concurrent ones share an analysis;
+    cold requests go through the other symbols in turn.
+
+    Args:
+        url (str): Address of /api/generate
+        clients (int): Concurrent clients
+        symbols (list): Symbols the server knows
+        duration (float, optional): Seconds during which requests are started
+        requests_count (int, optional): Requests to send in total, instead of a duration
+        stream_ratio (float, optional): Share of streaming requests. Defaults to 0.5.
+        hot_ratio (float, optional): Share of requests on hot symbols. Defaults to 0.8.
+        hot_symbols (int, optional): Number of hot symbols. Defaults to 1.
+        timeout (float, optional): Seconds a request may wait for the server between two reads. Defaults to 600.
+        seed (int, optional): Seed of the request mix. Defaults to 0.
+
+    Returns:
+        list: Output of send_request for every request, with its symbol and kind
+    """
+    import requests
+
+    hot, cold = symbols[:hot_symbols], symbols[hot_symbols:] or symbols[:hot_symbols]
+    lock = threading.Lock()
+    state = {"sent": 0, "cold": 0}
+    deadline = time.monotonic() + duration if duration else None
+    results = []
+
+    def next_request(rng):
+        with lock:
+            if (requests_count is not None and state["sent"] >= requests_count) or \
+                    (deadline is not None and time.monotonic() >= deadline):
+                return None
+            state["sent"] += 1
+            is_hot = rng.random() < hot_ratio
+            if is_hot:
+                symbol = rng.choice(hot)
+            else:
+                symbol = cold[state["cold"] % len(cold)]
+                state["cold"] += 1
+        return symbol, is_hot, rng.random() < stream_ratio
+
+    def client(index):
+        rng = random.Random(seed * 1000 + index)
+        with requests.Session() as session:
+            while (request := next_request(rng)) is not None:
+                symbol, is_hot, stream = request
+                result = send_request(session, url, symbol, stream, timeout)
+                with lock:
+                    results.append({**result, "symbol": symbol, "hot": is_hot, "stream": stream})
+
+    with ThreadPoolExecutor(max_workers=clients) as executor:
+        list(executor.map(client, range(clients)))
+    return results
+
+
+def summarize(results, seconds):
+    """
+    Args:
+        results (list): Output of run_level
+        seconds (float): Wall time of the level
+
+    Returns:
+        dict: Counts per status, completed requests per second, and p50/p95/p99 of the time to first
+            token (streaming requests) and of the latency (completed requests), in seconds
+    """
+    ok = [result for result in results if result["status"] == "ok"]
+    summary = {
+        "requests": len(results),
+        "ok": len(ok),
+        "rejected": sum(result["status"] == "rejected" for result in results),
+        "errors": sum(result["status"] == "error" for result in results),
+        "seconds": round(seconds, 3),
+        "throughput": round(len(ok) / seconds, 4) if seconds else None,
+    }
+    groups = {"ttft": [result["ttft"] for result in ok if result["ttft"] is not None],
+              "latency": [result["latency"] for result in ok],
+              "latency_hot": [result["latency"] for result in ok if result["hot"]],
+              "latency_cold": [result["latency"] for result in ok if not result["hot"]]}
+    for name, values in groups.items():
+        for q in (50, 95, 99):
+            value = percentile(values, q)
+            summary[f"{name}_p{q}"] = round(value, 4) if value is not None else None
+    return summary
+
+
+def _format(value):
+    return "-" if value is None else f"{value:.2f}"
+
+
+def print_summary(clients, summary):
+    print(f"{clients:>4} clients  {summary['requests']:>5} requests  ok {summary['ok']:>5}  "
+          f"503 {summary['rejected']:>4}  errors {summary['errors']:>3}  {summary['throughput']:>7.3f} req/s  "
+          f"TTFT p50/p95/p99 {_format(summary['ttft_p50'])}/{_format(summary['ttft_p95'])}/"
+          f"{_format(summary['ttft_p99'])}s  latency {_format(summary['latency_p50'])}/"
+          f"{_format(summary['latency_p95'])}/{_format(summary['latency_p99'])}s", flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the API against a fake Ollama server")
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 4, 16], help="concurrent clients, per level")
+    parser.add_argument("--duration", type=float, default=30, help="seconds during which requests are started, per level")
+    parser.add_argument("--requests", type=int, help="requests per level, instead of --duration")
+    parser.add_argument("--stream-ratio", type=float, default=0.5, help="share of streaming requests")
+    parser.add_argument("--hot-ratio", type=float, default=0.8, help="share of requests on hot symbols")
+    parser.add_argument("--hot-symbols", type=int, default=1, help="number of hot symbols")
+    parser.add_argument("--latency", type=float, default=0.1, help="seconds before Ollama evaluates a request")
+    parser.add_argument("--tokens-per-sec", type=float, default=100, help="generation speed of the fake Ollama")
+    parser.add_argument("--prompt-tokens-per-sec", type=float, default=0,
+                        help="prompt evaluation speed of the fake Ollama, 0 for no delay")
+    parser.add_argument("--answer-tokens", type=int, default=60, help="tokens per fake Ollama answer")
+    parser.add_argument("--ollama-parallel", type=int, default=1, help="requests the fake Ollama evaluates at once")
+    parser.add_argument("--threads", type=int, default=int(os.getenv("API_THREADS", 32)), help="threads of api.py")
+    parser.add_argument("--workers", type=int, help="ANALYSIS_WORKERS of api.py")
+    parser.add_argument("--queue", type=int, help="ANALYSIS_QUEUE of api.py")
+    parser.add_argument("--llm-cache", action="store_true",
+                        help="let api.py answer repeated prompts from its LLM cache instead of calling Ollama")
+    parser.add_argument("--fixtures", default=os.getenv("FIXTURES_DIR", os.path.join(ROOT, "fixtures")),
+                        help="fixture directory")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the request mix")
+    parser.add_argument("--output", help="results file, defaults to data/loadtests/{commit}.json")
+    args = parser.parse_args()
+
+    fixtures = os.path.abspath(args.fixtures)
+    symbols = sorted(name for name in os.listdir(fixtures) if not name.startswith("_")) \
+        if os.path.isdir(fixtures) else []
+    if not symbols:
+        raise SystemExit("No fixtures to replay, record them first with: python bench.py --record N")
+
+    from fake_llm import serve_fake_ollama
+
+    ollama = serve_fake_ollama(latency=args.latency, parallel=args.ollama_parallel,
+                               tokens_per_sec=args.tokens_per_sec,
+                               prompt_tokens_per_sec=args.prompt_tokens_per_sec,
+                               answer_tokens=args.answer_tokens)
+    port = free_port()
+    env = {**os.environ, "DATA_PROVIDER": "replay", "FIXTURES_DIR": fixtures, "LLM_BACKEND": "ollama",
+           "OLLAMA_HOST": f"http://127.0.0.1:{ollama.server_address[1]}",
+           "LLM_CACHE_BYPASS": "0" if args.llm_cache else "1", "PYTHONPATH": ROOT}
+    env.setdefault("LOGGING_LEVEL", "30")
+    if args.workers:
+        env["ANALYSIS_WORKERS"] = str(args.workers)
+    if args.queue is not None:
+        env["ANALYSIS_QUEUE"] = str(args.queue)
+
+    # Caches, indicator state and analyses are written to a scratch directory, not ./data
+    workdir = tempfile.mkdtemp(prefix="loadtest-")
+    shutil.copy(os.path.join(ROOT, "prompts.yaml"), workdir)
+    server = start_api(port, env, workdir, args.threads)
+    url = f"http://127.0.0.1:{port}/api/generate"
+    levels = {}
+    try:
+        for clients in args.clients:
+            start = time.perf_counter()
+            results = run_level(url, clients, symbols, duration=None if args.requests else args.duration,
+                                requests_count=args.requests, stream_ratio=args.stream_ratio,
+                                hot_ratio=args.hot_ratio, hot_symbols=args.hot_symbols, seed=args.seed)
+            levels[str(clients)] = summarize(results, time.perf_counter() - start)
+            print_summary(clients, levels[str(clients)])
+    finally:
+        server.terminate()
+        server.wait()
+        ollama.shutdown()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    commit, dirty = git_commit()
+    output = os.path.abspath(args.output or os.path.join(ROOT, "data", "loadtests", f"{commit}.json"))
+    report = {
+        "commit": commit,
+        "dirty": dirty,
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {key: value for key, value in vars(args).items() if key != "output"},
+        "results": levels,
+    }
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w") as file:
+        json.dump(report, file, indent=2)
+    print(f"Results saved in {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+import threading
+import logging
+import re
+import os
+
+DEFAULT_MODEL = os.getenv("LLM_MODEL", "deepseek-r1:1.5b")
+# Model an agent is rerun on when its answer fails the structural check, empty to never escalate
+ESCALATION_MODEL = os.getenv("LLM_ESCALATION_MODEL", "deepseek-r1:8b")
+# Answers shorter than this, without their thinking, are considered failed
+MIN_ANSWER_CHARS = int(os.getenv("MIN_ANSWER_CHARS", 200))
+
+# Ratings each agent is asked for in the 'Expected Output' of its prompt; an answer must contain one
+ANSWER_PATTERNS = {
+    "health-check-agent": r"\b(strong|stable|weak)\b",
+    "financial-stability-agent": r"\b(healthy|moderate risk|high risk)\b",
+    "valuation-agent": r"\b(overvalued|fairly valued|undervalued)\b",
+    "market-sentiment-agent": r"\b(buy|hold|sell)\b",
+    "decision-making-agent": r"\b(strong buy|buy|hold|sell|avoid)\b",
+}
+
+
+def parse_agent_models(value):
+    """
+    Parses per-agent model assignments.
+
+    Args:
+        value (str): Comma-separated agent=model pairs, e.g. 'decision-making-agent=deepseek-r1:8b'
+
+    Returns:
+        dict: Mapping of agent to model
+    """
+    models = {}
+    for pair in filter(None, (pair.strip() for pair in value.split(","))):
+        agent, _, model = pair.partition("=")
+        if not model:
+            raise ValueError(f"Invalid AGENT_MODELS entry '{pair}', expected agent=model")
+        models[agent.strip()] = model.strip()
+    return models
+
+
+AGENT_MODELS = parse_agent_models(os.getenv("AGENT_MODELS", "decision-making-agent=deepseek-r1:8b"))
+
+
+def check_answer(agent, answer):
+    """
+    Checks the structure of an agent's answer.
+
+    Args:
+        agent (str): Agent name
+        answer (str): Answer with the <think> block removed
+
+    Returns:
+        list: Descriptions of the problems, empty if the answer is fine
+    """
+    problems = []
+    if "<think>" in answer:
+        problems.append("reasoning was not closed")
+    if len(answer.strip()) < MIN_ANSWER_CHARS:
+        problems.append(f"answer has {len(answer.strip())} characters, fewer than {MIN_ANSWER_CHARS}")
+    pattern = ANSWER_PATTERNS.get(agent)
+    if pattern and not re.search(pattern, answer, flags=re.IGNORECASE):
+        problems.append("no rating given")
+    return problems
+
+
+class ModelRouter:
+    """
+    Assigns a model to every agent and escalates failed answers to a larger model.
+
+    Small models answer the data agents quickly, while the decision agent, which has to
+    weigh all previous answers, can run on a larger one. One client is created per model.
+    """
+
+    def __init__(self, create_client, default_model=None, agent_models=None, escalation_model=None):
+        """
+        Args:
+            create_client (callable): Called with a model name, returns a client with generate and generate_stream
+            default_model (str, optional): Model of agents without an assignment. Defaults to LLM_MODEL.
+            agent_models (dict, optional): Mapping of agent to model. Defaults to AGENT_MODELS.
+            escalation_model (str, optional): Model failed answers are rerun on, '' to never escalate.
+                Defaults to LLM_ESCALATION_MODEL.
+        """
+        self.create_client = create_client
+        self.default_model = default_model or DEFAULT_MODEL
+        self.agent_models = AGENT_MODELS if agent_models is None else agent_models
+        self.escalation_model = ESCALATION_MODEL if escalation_model is None else escalation_model
+        self._clients = {}
+        self._lock = threading.Lock()
+
+    def model_for(self, agent):
+        return self.agent_models.get(agent, self.default_model)
+
+    def models_for(self, agent):
+        """
+        Returns:
+            list: The agent's model, followed by the escalation model if it is a different one
+        """
+        model = self.model_for(agent)
+        if self.escalation_model and self.escalation_model != model:
+            return [model, self.escalation_model]
+        return [model]
+
+    def client(self, model):
+        """
+        Returns:
+            The client of a model, created on first use
+        """
+        with self._lock:
+            if model not in self._clients:
+                logging.debug(f"Creating LLM client for {model}")
+                self._clients[model] = self.create_client(model)
+            return self._clients[model]
+
+    def stats(self):
+        """
+        Returns:
+            dict: Response cache hits and misses summed over the clients created so far, and the size of the
+                cache file they share
+        """
+        with self._lock:
+            clients = list(self._clients.values())
+        totals = {"hits": 0, "misses": 0, "size_bytes": 0}
+        for client in clients:
+            for key, value in client.stats().items():
+                totals[key] = value if key == "size_bytes" else totals[key] + value
+        return totals
@@ -0,0 +1,91 @@
+import requests
+import json
+import os
+
+
+class OllamaClient:
+    """
+    Minimal client for Ollama's /api/generate endpoint.
+
+    Unlike the LangChain wrapper it returns Ollama's full response, including the `context`
+    token array and the prompt/eval counters, so a conversation can be continued without
+    re-sending it. `invoke` and `stream` mirror the LangChain interface.
+    """
+
+    def __init__(self, model, base_url=None, options=None, timeout=600):
+        """
+        Args:
+            model (str): Ollama model name, e.g. deepseek-r1:1.5b
+            base_url (str, optional): Ollama server address. Defaults to OLLAMA_HOST or http://localhost:11434.
+            options (dict, optional): Model options sent with every request, e.g. temperature
+            timeout (int, optional): Request timeout in seconds. Defaults to 600.
+        """
+        base_url = base_url or os.getenv("OLLAMA_HOST", "http://localhost:11434")
+        if not base_url.startswith("http"):
+            base_url = "http://" + base_url
+        self.model = model
+        self.base_url = base_url.rstrip("/")
+        self.options = options or {}
+        self.timeout = timeout
+        self._session = requests.Session()
+
+    def _payload(self, prompt, context, stream, options):
+        payload = {"model": self.model, "prompt": prompt, "stream": stream}
+        options = {**self.options, **(options or {})}
+        if options:
+            payload["options"] = options
+        if context:
+            payload["context"] = context
+        return payload
+
+    def generate(self, prompt, context=None, options=None):
+        """
+        Generates a complete response.
+
+        Args:
+            prompt (str): Prompt to evaluate after the context
+            context (list, optional): Token array returned by a previous call to continue from
+            options (dict, optional): Model options for this request
+
+        Returns:
+            dict: Ollama's response including 'response', 'context' and the duration/count fields
+        """
+        response = self._session.post(f"{self.base_url}/api/generate",
+                                      json=self._payload(prompt, context, False, options), timeout=self.timeout)
+        response.raise_for_status()
+        result = response.json()
+        if "error" in result:
+            raise RuntimeError(f"Ollama error: {result['error']}")
+        return result
+
+    def generate_stream(self, prompt, context=None, options=None):
+        """
+        Generates a response chunk by chunk.
+
+        Args:
+            prompt (str): Prompt to evaluate after the context
+            context (list, optional): Token array returned by a previous call to continue from
+            options (dict, optional): Model options for this request
+
+        Yields:
+            dict: Ollama's chunks; the last one has 'done' set and carries 'context' and the counters
+        """
+        with self._session.post(f"{self.base_url}/api/generate", json=self._payload(prompt, context, True, options),
+                                stream=True, timeout=self.timeout) as response:
+            response.raise_for_status()
+            # chunk_size=None yields each chunk of Ollama's chunked response as soon as it arrives
+            for line in response.iter_lines(chunk_size=None):
+                if not line:
+                    continue
+                chunk = json.loads(line)
+                if "error" in chunk:
+                    raise RuntimeError(f"Ollama error: {chunk['error']}")
+                yield chunk
+
+    def invoke(self, prompt):
+        return self.generate(prompt)["response"]
+
+    def stream(self, prompt):
+        for chunk in self.generate_stream(prompt):
+            if chunk.get("response"):
+                yield chunk["response"]
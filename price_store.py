@@ -0,0 +1,157 @@
+from datetime import date
+import threading
+import json
+import time
+import os
+import logging
+
+COLUMNS = ("open", "high", "low", "close", "volume", "adjclose")
+EPOCH = "1970-01-01"
+
+
+class PriceStore:
+    """
+    Daily price bars per symbol in memory-mapped NumPy files.
+
+    Each symbol has one file, {symbol}.npy, holding a (1 + len(COLUMNS), bars) float64 array:
+    the bar dates as days since 1970-01-01, followed by one row per price column. Every column
+    of a date range is therefore a contiguous slice of the mapped file, and read() wraps those
+    slices in a DataFrame without copying them. A {symbol}.json sidecar records from which
+    date the history is complete and when it was last fetched.
+    """
+
+    def __init__(self, directory=None):
+        """
+        Args:
+            directory (str, optional): Where the files are kept. Defaults to PRICE_STORE_DIR or data/prices.
+        """
+        self.directory = directory or os.getenv("PRICE_STORE_DIR", "data/prices")
+        self._lock = threading.Lock()
+
+    def _path(self, symbol, extension):
+        return os.path.join(self.directory, f"{symbol}.{extension}")
+
+    def _load(self, symbol):
+        import numpy as np
+
+        try:
+            # Copy-on-write mapping: callers may modify the frames without touching the file
+            return np.load(self._path(symbol, "npy"), mmap_mode="c")
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logging.warning(f"Ignoring unreadable price history of {symbol}: {e}")
+            return None
+
+    def metadata(self, symbol):
+        """
+        Returns:
+            dict: {'start', 'fetched_at'} of the stored history, or None if there is none
+        """
+        try:
+            with open(self._path(symbol, "json"), "r") as file:
+                metadata = json.load(file)
+        except (OSError, ValueError):
+            return None
+        return {"start": date.fromisoformat(metadata["start"]), "fetched_at": metadata["fetched_at"]}
+
+    def dates(self, symbol):
+        """
+        Returns:
+            list: Dates of the stored bars, empty if there are none
+        """
+        import numpy as np
+
+        array = self._load(symbol)
+        if array is None:
+            return []
+        return list((np.datetime64(EPOCH, "D") + array[0].astype("timedelta64[D]")).astype(object))
+
+    def bar(self, symbol, on):
+        """
+        Returns:
+            dict: Stored COLUMNS of the bar on a date, or None
+        """
+        import numpy as np
+
+        array = self._load(symbol)
+        if array is None:
+            return None
+        day = (np.datetime64(on, "D") - np.datetime64(EPOCH, "D")).astype(np.int64)
+        index = np.searchsorted(array[0], day)
+        if index < array.shape[1] and array[0, index] == day:
+            return {column: float(array[i, index]) for i, column in enumerate(COLUMNS, start=1)}
+        return None
+
+    def write(self, symbol, bars, start, replace=False):
+        """
+        Merges fetched bars into the stored history.
+
+        Args:
+            symbol (str): Stock symbol of the company
+            bars (DataFrame): Bars with a 'date' column and COLUMNS, as returned by yahooquery
+            start (date): First date the fetch covered
+            replace (bool, optional): Drop the stored bars first, e.g. after prices were adjusted. Defaults to False.
+        """
+        import numpy as np
+        import pandas as pd
+
+        dates = pd.to_datetime(bars["date"], utc=True).dt.tz_convert(None).dt.normalize()
+        new = np.empty((1 + len(COLUMNS), len(bars)), dtype=np.float64)
+        new[0] = (dates.to_numpy().astype("datetime64[D]") - np.datetime64(EPOCH, "D")).astype(np.int64)
+        for i, column in enumerate(COLUMNS, start=1):
+            new[i] = bars[column].to_numpy(dtype=np.float64, na_value=np.nan) if column in bars else np.nan
+        new = new[:, np.argsort(new[0], kind="stable")]
+
+        with self._lock:
+            old = None if replace else self._load(symbol)
+            metadata = None if replace else self.metadata(symbol)
+            if old is not None and new.shape[1]:
+                # Fetched bars replace stored ones of the same dates
+                keep = (old[0] < new[0, 0]) | (old[0] > new[0, -1])
+                merged = np.concatenate([np.asarray(old[:, keep]), new], axis=1)
+                merged = merged[:, np.argsort(merged[0], kind="stable")]
+            elif old is not None:
+                merged = np.asarray(old)
+            else:
+                merged = new
+            start = min(start, metadata["start"]) if metadata else start
+
+            os.makedirs(self.directory, exist_ok=True)
+            temp_path = self._path(symbol, "tmp.npy")
+            np.save(temp_path, merged)
+            os.replace(temp_path, self._path(symbol, "npy"))
+            temp_path = self._path(symbol, "json.tmp")
+            with open(temp_path, "w") as file:
+                json.dump({"start": start.isoformat(), "fetched_at": time.time()}, file)
+            os.replace(temp_path, self._path(symbol, "json"))
+
+    def read(self, symbol, start=None, end=None):
+        """
+        Reads the stored bars of a date range without copying the price columns.
+
+        Args:
+            symbol (str): Stock symbol of the company
+            start (date, optional): First date. Defaults to the first stored bar.
+            end (date, optional): Last date. Defaults to the last stored bar.
+
+        Returns:
+            DataFrame: Columns symbol, date and COLUMNS as returned by yahooquery, or None if nothing is stored
+        """
+        import numpy as np
+        import pandas as pd
+
+        array = self._load(symbol)
+        if array is None:
+            return None
+        epoch = np.datetime64(EPOCH, "D")
+        days = array[0]
+        first = np.searchsorted(days, (np.datetime64(start, "D") - epoch).astype(np.int64)) if start else 0
+        last = (np.searchsorted(days, (np.datetime64(end, "D") - epoch).astype(np.int64), side="right")
+                if end else len(days))
+        block = array[:, first:last]
+        columns = {"symbol": np.full(block.shape[1], symbol, dtype=object),
+                   "date": epoch + block[0].astype("timedelta64[D]")}
+        columns.update({column: block[i] for i, column in enumerate(COLUMNS, start=1)})
+        return pd.DataFrame(columns, copy=False)
+
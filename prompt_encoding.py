@@ -0,0 +1,222 @@
+import math
+import re
+import os
+import logging
+
+# Approximate token budget for the variable data of each agent prompt
+TOKEN_BUDGETS = {
+    "health-check-agent": int(os.getenv("HEALTH_CHECK_TOKEN_BUDGET", 200)),
+    "financial-stability-agent": int(os.getenv("FINANCIAL_STABILITY_TOKEN_BUDGET", 600)),
+    "market-sentiment-agent": int(os.getenv("MARKET_SENTIMENT_TOKEN_BUDGET", 800)),
+}
+# Bar sizes tried, from finest to coarsest, until the price history fits its budget
+HISTORY_FREQUENCIES = [("W", "Weekly"), ("2W", "Bi-weekly"), ("ME", "Monthly"), ("QE", "Quarterly")]
+
+_TOKEN_PATTERN = re.compile(r"[A-Za-z]+|\d{1,3}|[^\sA-Za-z\d]")
+
+
+def estimate_tokens(text):
+    """
+    Estimates the number of LLM tokens in a text.
+
+    Words count as one token, digits in groups of up to three and every other symbol as
+    one token each, which is close to how BPE tokenizers split numeric tables.
+
+    Args:
+        text (str): Text to measure
+
+    Returns:
+        int: Approximate token count
+    """
+    return len(_TOKEN_PATTERN.findall(text))
+
+
+def compact_number(value, precision=2):
+    """
+    Renders a number with a magnitude suffix, e.g. 1234567890 -> 1.23B.
+
+    Args:
+        value: Number to render; missing values render as 'N/A'
+        precision (int, optional): Decimal places. Defaults to 2.
+
+    Returns:
+        str: Compact representation
+    """
+    if value is None or isinstance(value, str):
+        return value or "N/A"
+    if isinstance(value, float) and math.isnan(value):
+        return "N/A"
+    for divisor, suffix in [(1e12, "T"), (1e9, "B"), (1e6, "M"), (1e3, "K")]:
+        if abs(value) >= divisor:
+            return f"{value / divisor:.{precision}f}{suffix}"
+    return f"{value:.{precision}f}"
+
+
+def encode_table(rows, columns, precision=2):
+    """
+    Renders rows as a pipe-separated table with a single header line.
+
+    Args:
+        rows (list): Rows as lists of values in the order of `columns`
+        columns (list): Column names
+        precision (int, optional): Decimal places for numbers. Defaults to 2.
+
+    Returns:
+        str: Table text
+    """
+    lines = ["|".join(columns)]
+    for row in rows:
+        lines.append("|".join(value if isinstance(value, str) else compact_number(value, precision) for value in row))
+    return "\n".join(lines)
+
+
+def fit_recent(render, items, budget=None, precision=2):
+    """
+    Renders the most recent items that fit a token budget.
+
+    The oldest items are dropped first; if even the latest one does not fit, fewer decimal
+    places are tried the same way.
+
+    Args:
+        render (callable): Called with a list of items and a precision, returns the text
+        items (list): Items in chronological order
+        budget (int, optional): Approximate token budget. Defaults to no limit.
+        precision (int, optional): Decimal places tried first. Defaults to 2.
+
+    Returns:
+        str: The text of the most items that fit, or of the latest item at 0 decimals if none does
+    """
+    text = render(items, precision)
+    if budget is None or estimate_tokens(text) <= budget:
+        return text
+    for digits in range(precision, -1, -1):
+        for start in range(len(items)):
+            text = render(items[start:], digits)
+            if estimate_tokens(text) <= budget:
+                if start:
+                    logging.debug(f"Dropped the {start} oldest of {len(items)} quarters to fit {budget} tokens")
+                return text
+    logging.debug(f"The latest quarter does not fit {budget} tokens")
+    return text
+
+
+def encode_eps_trend(eps_trend, precision=2, budget=None):
+    """
+    Renders the output of get_eps_trend as 'date: eps' pairs.
+
+    Args:
+        eps_trend (dict): Mapping of dates to Basic EPS values
+        precision (int, optional): Decimal places. Defaults to 2.
+        budget (int, optional): Approximate token budget, see fit_recent. Defaults to no limit.
+
+    Returns:
+        str: Compact EPS trend
+    """
+    import pandas as pd
+
+    items = sorted((pd.Timestamp(date).date(), eps) for date, eps in eps_trend.items())
+    return fit_recent(lambda items, digits: ", ".join(f"{date}: {compact_number(eps, digits)}" for date, eps in items),
+                      items, budget, precision)
+
+
+def encode_financial_metrics(metrics, precision=2, budget=None):
+    """
+    Renders the output of compute_financial_metrics as one table row per quarter.
+
+    Args:
+        metrics (dict): Mapping of dates to metric dicts, including the nested 'debt levels'
+        precision (int, optional): Decimal places. Defaults to 2.
+        budget (int, optional): Approximate token budget, see fit_recent. Defaults to no limit.
+
+    Returns:
+        str: Table text
+    """
+    import pandas as pd
+
+    rows = []
+    columns = []
+    for date, values in metrics.items():
+        flat = {key: value for key, value in values.items() if key != "debt levels"}
+        flat.update(values.get("debt levels", {}))
+        if not columns:
+            columns = list(flat)
+        rows.append([str(pd.Timestamp(date).date())] + [flat.get(column) for column in columns])
+    rows.sort(key=lambda row: row[0])
+    return fit_recent(lambda rows, digits: encode_table(rows, ["date"] + columns, digits), rows, budget, precision)
+
+
+def summarize_history(historical_data, precision=2):
+    """
+    Summarizes processed price history in a single line.
+
+    Args:
+        historical_data (DataFrame): Output of process_historical_data
+        precision (int, optional): Decimal places. Defaults to 2.
+
+    Returns:
+        str: Period, first/last/min/max close, total return and mean annualized volatility
+    """
+    data = historical_data.dropna(subset=["close"])
+    if data.empty:
+        return "No price history"
+    close = data["close"]
+    total_return = close.iloc[-1] / close.iloc[0] - 1
+    return (f"{data['date'].iloc[0]} to {data['date'].iloc[-1]}: close {compact_number(close.iloc[0], precision)} -> "
+            f"{compact_number(close.iloc[-1], precision)} (min {compact_number(close.min(), precision)}, "
+            f"max {compact_number(close.max(), precision)}), return {total_return:.1%}, "
+            f"mean volatility {data['rolling_volatility'].mean():.1%}")
+
+
+def downsample_history(historical_data, freq="W"):
+    """
+    Aggregates processed daily price history into bars.
+
+    Args:
+        historical_data (DataFrame): Output of process_historical_data
+        freq (str, optional): Pandas offset alias of the bar size. Defaults to 'W'.
+
+    Returns:
+        DataFrame: One row per bar with its last date and close, compounded return and last volatility
+    """
+    import pandas as pd
+
+    data = historical_data.set_index(pd.to_datetime(historical_data["date"]))
+    data["last_date"] = data.index
+    bars = data.resample(freq).agg({
+        "last_date": "last",
+        "close": "last",
+        "daily_return": lambda returns: (1 + returns.dropna()).prod() - 1,
+        "rolling_volatility": "last",
+    })
+    bars = bars.dropna(subset=["close"])
+    # Labelled with the last trading day in the bar, not the end of the bin, which may lie in the future
+    bars.index = pd.DatetimeIndex(bars.pop("last_date")).date
+    return bars.rename(columns={"daily_return": "return"})
+
+
+def encode_history(historical_data, budget=None, precision=2):
+    """
+    Renders processed price history as a summary line plus the finest bar table that fits the budget.
+
+    Args:
+        historical_data (DataFrame): Output of process_historical_data
+        budget (int, optional): Approximate token budget. Defaults to the market-sentiment-agent budget.
+        precision (int, optional): Decimal places for prices. Defaults to 2.
+
+    Returns:
+        str: Encoded history
+    """
+    import pandas as pd
+
+    budget = budget or TOKEN_BUDGETS["market-sentiment-agent"]
+    summary = summarize_history(historical_data, precision)
+    for freq, label in HISTORY_FREQUENCIES:
+        bars = downsample_history(historical_data, freq)
+        rows = [[str(date), row["close"], f"{row['return']:.1%}",
+                 "N/A" if pd.isna(row["rolling_volatility"]) else f"{row['rolling_volatility']:.1%}"]
+                for date, row in bars.iterrows()]
+        text = f"{summary}\n{label} bars:\n" + encode_table(rows, ["date", "close", "return", "volatility"], precision)
+        if estimate_tokens(text) <= budget:
+            return text
+    logging.debug(f"Price history does not fit {budget} tokens even as quarterly bars, sending summary only")
+    return summary
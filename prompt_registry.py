@@ -0,0 +1,129 @@
+from collections.abc import Mapping
+from string import Formatter
+import threading
+
+
+class PromptTemplate(str):
+    """
+    Prompt template parsed once when loaded.
+
+    It is still a str, so it can be used wherever the raw template text was used, but
+    `format` checks the values against the template's placeholders before rendering.
+    """
+
+    def __new__(cls, text, name=""):
+        template = super().__new__(cls, text)
+        template.name = name
+        parsed = list(Formatter().parse(text))
+        template.fields = frozenset(field for _, field, _, _ in parsed if field is not None)
+        # Static text up to the paragraph holding the first placeholder. It is identical for every
+        # symbol, so the backend can reuse the evaluated prefix between calls.
+        first_field = text.find("{") if template.fields else len(text)
+        paragraph = text.rfind("\n\n", 0, first_field)
+        template.prefix = text[:paragraph + 2] if template.fields and paragraph >= 0 else text[:first_field]
+        return template
+
+    def format(self, **values):
+        """
+        Renders the template.
+
+        Args:
+            **values: A value for every placeholder
+
+        Returns:
+            str: The rendered prompt
+
+        Raises:
+            ValueError: If values are missing or not placeholders of the template
+        """
+        if values.keys() != self.fields:
+            raise ValueError(f"Prompt '{self.name}' expects {sorted(self.fields)}, got {sorted(values)}: "
+                             f"missing {sorted(self.fields - values.keys())}, "
+                             f"unknown {sorted(values.keys() - self.fields)}")
+        return str.format(self, **values)
+
+
+class PromptRegistry(Mapping):
+    """
+    Prompt templates by name, loaded from a YAML file on first access.
+    """
+
+    def __init__(self, path):
+        """
+        Args:
+            path (str): YAML file mapping names to templates
+        """
+        self.path = path
+        self._templates = None
+        self._expected = {}
+        self._lock = threading.Lock()
+
+    @property
+    def templates(self):
+        with self._lock:
+            if self._templates is None:
+                import yaml
+
+                with open(self.path, 'r', encoding="utf-8") as file:
+                    templates = yaml.safe_load(file)
+                self._templates = {name: PromptTemplate(text, name) for name, text in templates.items()}
+                self._check(self._expected)
+            return self._templates
+
+    def __getitem__(self, name):
+        return self.templates[name]
+
+    def __iter__(self):
+        return iter(self.templates)
+
+    def __len__(self):
+        return len(self.templates)
+
+    def validate(self, fields):
+        """
+        Checks that the templates have exactly the placeholders their callers fill in.
+
+        If the templates are not loaded yet, the check runs when they are, so that registering
+        the expected placeholders at import does not read the file.
+
+        Args:
+            fields (dict): Mapping of template name to the set of placeholders it is rendered with
+
+        Raises:
+            ValueError: If a template is missing or its placeholders differ
+        """
+        with self._lock:
+            self._expected = {**self._expected, **fields}
+            if self._templates is not None:
+                self._check(fields)
+
+    def _check(self, fields):
+        errors = []
+        for name, expected in fields.items():
+            if name not in self._templates:
+                errors.append(f"'{name}' is missing")
+            elif self._templates[name].fields != set(expected):
+                errors.append(f"'{name}' has placeholders {sorted(self._templates[name].fields)}, "
+                              f"expected {sorted(expected)}")
+        if errors:
+            self._templates = None
+            raise ValueError(f"Invalid prompts in {self.path}: " + "; ".join(errors))
+
+    def with_memory(self, name, prompt, memory):
+        """
+        Adds the previous agents' answers to a rendered prompt, after its static prefix, so that
+        the prefix stays identical across symbols.
+
+        Args:
+            name (str): Template the prompt was rendered from
+            prompt (str): Rendered prompt
+            memory (list): Previous answers
+
+        Returns:
+            str: The prompt with the memory block
+        """
+        block = self['memory'].format(memory=memory)
+        prefix = self[name].prefix
+        if not prompt.startswith(prefix):
+            return block + prompt
+        return prefix + block + prompt[len(prefix):]
@@ -0,0 +1,305 @@
+from contextlib import contextmanager
+import pickle
+import os
+import logging
+
+MODULES = ["summaryDetail", "financialData", "quoteType", "defaultKeyStatistics", "earnings", "price",
+           "recommendationTrend", "assetProfile"]
+STATEMENTS = ["income_statement", "balance_sheet", "cash_flow"]
+
+
+class DataProvider:
+    """
+    Interface of the sources utils reads market data from.
+
+    Implementations return yahooquery-shaped data so that everything downstream
+    (the cache, build_prompts, the apps) works unchanged whatever the source.
+    """
+
+    def screener(self, name, count):
+        """
+        Args:
+            name (str): Yahoo screener id, e.g. most_actives
+            count (int): Number of quotes
+
+        Returns:
+            list: Quote dicts with at least 'symbol' and 'shortName'
+        """
+        raise NotImplementedError
+
+    def fetch(self, symbols, kinds, max_workers=8):
+        """
+        Args:
+            symbols (list): Stock symbols of the companies
+            kinds (list): Module names from MODULES, statement names from STATEMENTS and/or 'historical_price'
+            max_workers (int, optional): Maximum number of concurrent requests. Defaults to 8.
+
+        Returns:
+            dict: Mapping of symbol to a dict of kind to data; data the source does not have is left out
+        """
+        raise NotImplementedError
+
+    def history(self, symbols, start, max_workers=8):
+        """
+        Args:
+            symbols (list): Stock symbols of the companies
+            start (date): First date of the daily bars
+            max_workers (int, optional): Maximum number of concurrent requests. Defaults to 8.
+
+        Returns:
+            dict: Mapping of symbol to a DataFrame of daily bars from `start`, in the format of
+                'historical_price'; symbols the source has no bars for are left out
+        """
+        raise NotImplementedError
+
+
+def _split_by_symbol(frame):
+    """
+    Splits a multi-symbol yahooquery result into per-symbol DataFrames.
+
+    Args:
+        frame (DataFrame or dict): Result indexed by symbol, or a dict of per-symbol results
+            which yahooquery returns when some symbols fail
+
+    Returns:
+        dict: Mapping of symbol to DataFrame; failed symbols are left out
+    """
+    import pandas as pd
+
+    if isinstance(frame, dict):
+        return {symbol: df for symbol, df in frame.items() if isinstance(df, pd.DataFrame)}
+    if not isinstance(frame, pd.DataFrame):
+        return {}
+    return {symbol: group for symbol, group in frame.groupby(level=0, sort=False)}
+
+
+class YahooProvider(DataProvider):
+    """
+    Live data from Yahoo Finance through yahooquery.
+
+    Requests go through the process-wide SessionPool, which reuses connections, limits the
+    request rate and retries throttled requests. yahooquery is only imported once Yahoo Finance
+    is actually queried.
+    """
+
+    def __init__(self, pool=None):
+        """
+        Args:
+            pool (SessionPool, optional): Defaults to the process-wide pool.
+        """
+        self._pool = pool
+
+    @property
+    def pool(self):
+        from session_pool import get_session_pool
+
+        return self._pool or get_session_pool()
+
+    @contextmanager
+    def _ticker(self, symbols, max_workers):
+        # A single multi-symbol Ticker is used so that each kind costs one batch of concurrent
+        # requests (bounded by `max_workers`) instead of one request per symbol
+        from requests_futures.sessions import FuturesSession
+        from yahooquery import Ticker
+
+        with self.pool.session() as session:
+            if len(symbols) == 1:
+                yield Ticker(symbols, session=session)
+                return
+            futures = FuturesSession(max_workers=max_workers, session=session)
+            try:
+                yield Ticker(symbols, session=futures)
+            finally:
+                futures.close()
+
+    def screener(self, name, count):
+        from yahooquery import Screener
+
+        with self.pool.session() as session:
+            results = Screener(session=session).get_screeners([name], count=count)
+        return results[name]['quotes']
+
+    def fetch(self, symbols, kinds, max_workers=8):
+        with self._ticker(symbols, max_workers) as ticker:
+            return self._fetch(ticker, symbols, kinds)
+
+    def _fetch(self, ticker, symbols, kinds):
+        result = {symbol: {} for symbol in symbols}
+        modules = [kind for kind in kinds if kind in MODULES]
+        if modules:
+            data = ticker.get_modules(modules)
+            for symbol in symbols:
+                symbol_data = data.get(symbol) if isinstance(data, dict) else data
+                if len(modules) == 1 and isinstance(symbol_data, dict):
+                    # yahooquery drops the module level when a single module is requested
+                    symbol_data = {modules[0]: symbol_data}
+                if isinstance(symbol_data, dict):
+                    result[symbol].update({module: symbol_data[module] for module in modules if module in symbol_data})
+                else:
+                    logging.warning(f"Failed to fetch modules for {symbol}: {symbol_data}")
+        for statement in STATEMENTS:
+            if statement in kinds:
+                frames = _split_by_symbol(getattr(ticker, statement)(frequency='q', trailing=False))
+                for symbol, df in frames.items():
+                    result[symbol][statement] = df
+        if 'historical_price' in kinds:
+            frames = _split_by_symbol(ticker.history(period='1y', interval='1d'))
+            for symbol, df in frames.items():
+                result[symbol]['historical_price'] = df.reset_index()
+        return result
+
+    def history(self, symbols, start, max_workers=8):
+        with self._ticker(symbols, max_workers) as ticker:
+            frames = _split_by_symbol(ticker.history(start=start.isoformat(), interval='1d'))
+        return {symbol: df.reset_index() for symbol, df in frames.items()}
+
+
+class RecordingProvider(DataProvider):
+    """
+    Passes requests to another provider and saves every response as a fixture file.
+
+    Fixtures are pickled per symbol and kind under `directory`, in the layout ReplayProvider reads.
+    """
+
+    def __init__(self, provider, directory="fixtures"):
+        self.provider = provider
+        self.directory = directory
+
+    def _write(self, path, value):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as file:
+            pickle.dump(value, file, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def screener(self, name, count):
+        quotes = self.provider.screener(name, count)
+        self._write(os.path.join(self.directory, "_screeners", f"{name}.pkl"), quotes)
+        return quotes
+
+    def fetch(self, symbols, kinds, max_workers=8):
+        result = self.provider.fetch(symbols, kinds, max_workers=max_workers)
+        for symbol, data in result.items():
+            for kind, value in data.items():
+                self._write(os.path.join(self.directory, symbol, f"{kind}.pkl"), value)
+        logging.debug(f"Recorded {kinds} for {symbols} to {self.directory}")
+        return result
+
+    def history(self, symbols, start, max_workers=8):
+        import pandas as pd
+
+        result = self.provider.history(symbols, start, max_workers=max_workers)
+        for symbol, bars in result.items():
+            path = os.path.join(self.directory, symbol, "history.pkl")
+            if os.path.exists(path):
+                # Later gap fetches extend the recorded bars instead of replacing them
+                with open(path, "rb") as file:
+                    bars = pd.concat([pickle.load(file), bars]).drop_duplicates("date", keep="last")
+            self._write(path, bars.sort_values("date").reset_index(drop=True))
+        return result
+
+
+class ReplayProvider(DataProvider):
+    """
+    Serves fixtures saved by RecordingProvider without any network access.
+    """
+
+    def __init__(self, directory="fixtures"):
+        self.directory = directory
+
+    def _read(self, path):
+        with open(path, "rb") as file:
+            return pickle.load(file)
+
+    def symbols(self):
+        """
+        Returns:
+            list: Symbols that have recorded fixtures
+        """
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(name for name in os.listdir(self.directory) if not name.startswith("_"))
+
+    def screener(self, name, count):
+        path = os.path.join(self.directory, "_screeners", f"{name}.pkl")
+        if os.path.exists(path):
+            return self._read(path)[:count]
+        # Without a recorded screener every recorded symbol is part of the universe
+        quotes = []
+        for symbol in self.symbols()[:count]:
+            quote_type = self.fetch([symbol], ["quoteType"])[symbol].get("quoteType", {})
+            quotes.append({"symbol": symbol, "shortName": quote_type.get("shortName", symbol)})
+        return quotes
+
+    def fetch(self, symbols, kinds, max_workers=8):
+        result = {symbol: {} for symbol in symbols}
+        for symbol in symbols:
+            for kind in kinds:
+                path = os.path.join(self.directory, symbol, f"{kind}.pkl")
+                if os.path.exists(path):
+                    result[symbol][kind] = self._read(path)
+                else:
+                    logging.warning(f"No fixture for {symbol} {kind} in {self.directory}")
+        return result
+
+    def history(self, symbols, start, max_workers=8):
+        import pandas as pd
+
+        result = {}
+        for symbol in symbols:
+            # Bars recorded by history() cover more than the 1y recorded as 'historical_price'
+            for kind in ("history", "historical_price"):
+                path = os.path.join(self.directory, symbol, f"{kind}.pkl")
+                if os.path.exists(path):
+                    bars = self._read(path)
+                    dates = pd.to_datetime(bars["date"], utc=True).dt.tz_convert(None).dt.date
+                    result[symbol] = bars[dates >= start].reset_index(drop=True)
+                    break
+            else:
+                logging.warning(f"No price history fixture for {symbol} in {self.directory}")
+        return result
+
+
+def create_provider(name=None, directory=None):
+    """
+    Creates a data provider.
+
+    Args:
+        name (str, optional): 'yahoo', 'record' or 'replay'. Defaults to DATA_PROVIDER or 'yahoo'.
+        directory (str, optional): Fixture directory for 'record' and 'replay'. Defaults to FIXTURES_DIR or 'fixtures'.
+
+    Returns:
+        DataProvider: The provider
+    """
+    name = name or os.getenv("DATA_PROVIDER", "yahoo")
+    directory = directory or os.getenv("FIXTURES_DIR", "fixtures")
+    if name == "yahoo":
+        return YahooProvider()
+    if name == "record":
+        return RecordingProvider(YahooProvider(), directory)
+    if name == "replay":
+        return ReplayProvider(directory)
+    raise ValueError(f"Unknown data provider: {name}")
+
+
+_provider = None
+
+
+def get_provider():
+    """
+    Returns:
+        DataProvider: The process-wide provider, created from DATA_PROVIDER on first use
+    """
+    global _provider
+    if _provider is None:
+        _provider = create_provider()
+    return _provider
+
+
+def set_provider(provider):
+    """
+    Replaces the process-wide provider, e.g. with a ReplayProvider in benchmarks.
+
+    Args:
+        provider (DataProvider): The provider to use from now on
+    """
+    global _provider
+    _provider = provider
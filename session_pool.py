@@ -0,0 +1,189 @@
+from contextlib import contextmanager
+from curl_cffi import requests
+from curl_cffi.requests.exceptions import RequestException
+from yahooquery.constants import BROWSERS
+from yahooquery.session_management import setup_session
+import threading
+import random
+import queue
+import time
+import os
+import logging
+
+# Sessions kept open for reuse, which is also the number of yahooquery calls running at once
+YAHOO_SESSIONS = int(os.getenv("YAHOO_SESSIONS", 4))
+# Requests per second sent to Yahoo Finance across all sessions, and how many may be sent at once
+YAHOO_RATE = float(os.getenv("YAHOO_RATE", 5))
+YAHOO_BURST = int(os.getenv("YAHOO_BURST", 10))
+# Retries of a request answered with 429 or 5xx, waiting YAHOO_BACKOFF * 2**attempt seconds
+YAHOO_RETRIES = int(os.getenv("YAHOO_RETRIES", 4))
+YAHOO_BACKOFF = float(os.getenv("YAHOO_BACKOFF", 0.5))
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+CRUMB_URL = "/v1/test/getcrumb"
+
+
+class TokenBucket:
+    """
+    Limits the rate of requests shared by all threads of the process.
+    """
+
+    def __init__(self, rate, capacity):
+        """
+        Args:
+            rate (float): Tokens added per second
+            capacity (int): Maximum number of tokens, i.e. of requests sent at once after an idle period
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Takes a token, waiting until one is available.
+        """
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if now >= self._paused_until and self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = max(self._paused_until - now, (1 - self._tokens) / self.rate)
+            time.sleep(wait)
+
+    def pause(self, seconds):
+        """
+        Stops handing out tokens for a while, e.g. after Yahoo answered with 429.
+
+        Args:
+            seconds (float): How long to pause
+        """
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self._tokens = 0.0
+
+
+class RateLimitedSession(requests.Session):
+    """
+    Session that takes a token from a shared bucket before every request and retries
+    throttled and failed requests with exponential backoff.
+
+    The crumb yahooquery requests whenever a Ticker is created is fetched once per session.
+    """
+
+    def __init__(self, limiter, retries=None, backoff=None, **kwargs):
+        """
+        Args:
+            limiter (TokenBucket): Bucket shared by all sessions
+            retries (int, optional): Defaults to YAHOO_RETRIES.
+            backoff (float, optional): Seconds before the first retry. Defaults to YAHOO_BACKOFF.
+            **kwargs: Passed to curl_cffi's Session
+        """
+        super().__init__(**kwargs)
+        self.limiter = limiter
+        self.retries = YAHOO_RETRIES if retries is None else retries
+        self.backoff = YAHOO_BACKOFF if backoff is None else backoff
+        self._crumb = None
+
+    def _delay(self, attempt, response=None):
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after and retry_after.isdigit():
+            return float(retry_after)
+        # Jitter keeps the retries of concurrent requests from arriving together
+        return self.backoff * 2 ** attempt * (1 + random.random())
+
+    def request(self, method, url, *args, **kwargs):
+        if CRUMB_URL in url and self._crumb is not None:
+            return self._crumb
+        for attempt in range(self.retries + 1):
+            self.limiter.acquire()
+            try:
+                response = super().request(method, url, *args, **kwargs)
+            except RequestException as e:
+                if attempt == self.retries:
+                    raise
+                delay = self._delay(attempt)
+                logging.debug(f"{method} {url} failed ({e}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+                continue
+            if response.status_code not in RETRY_STATUSES or attempt == self.retries:
+                break
+            delay = self._delay(attempt, response)
+            if response.status_code == 429:
+                # Throttling applies to the whole client, so every session waits
+                self.limiter.pause(delay)
+            logging.debug(f"{method} {url} returned {response.status_code}, retrying in {delay:.1f}s")
+            time.sleep(delay)
+        if CRUMB_URL in url and response.status_code == 200 and response.text:
+            self._crumb = response
+        return response
+
+
+class SessionPool:
+    """
+    Keep-alive sessions for yahooquery, shared by all threads of a process.
+
+    yahooquery creates a new session, with a consent request and a crumb request, for every
+    Ticker. Handing it a pooled session instead reuses the connections, and all sessions draw
+    from one TokenBucket so that concurrent callers cannot exceed YAHOO_RATE together.
+    """
+
+    def __init__(self, size=None, rate=None, burst=None):
+        """
+        Args:
+            size (int, optional): Maximum number of sessions. Defaults to YAHOO_SESSIONS.
+            rate (float, optional): Requests per second. Defaults to YAHOO_RATE.
+            burst (int, optional): Capacity of the token bucket. Defaults to YAHOO_BURST.
+        """
+        self.limiter = TokenBucket(rate or YAHOO_RATE, burst or YAHOO_BURST)
+        self._available = threading.BoundedSemaphore(size or YAHOO_SESSIONS)
+        # Most recently used first, so that the warmest connections are reused
+        self._idle = queue.LifoQueue()
+
+    def _create(self):
+        impersonate = random.choice(list(BROWSERS))
+        session = RateLimitedSession(self.limiter, headers=BROWSERS[impersonate], impersonate=impersonate)
+        return setup_session(session)
+
+    @contextmanager
+    def session(self):
+        """
+        Checks out a session, waiting while all of them are in use.
+
+        Yields:
+            RateLimitedSession: Session to pass to yahooquery's Ticker or Screener
+        """
+        self._available.acquire()
+        try:
+            try:
+                session = self._idle.get_nowait()
+            except queue.Empty:
+                session = self._create()
+            yield session
+            self._idle.put(session)
+        finally:
+            self._available.release()
+
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def get_session_pool():
+    """
+    Returns:
+        SessionPool: The process-wide pool, created on first use and again in forked workers
+    """
+    global _pool, _pool_pid
+    with _pool_lock:
+        # Connections must not be shared with a forked child, e.g. a ProcessPoolExecutor worker
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = SessionPool()
+            _pool_pid = os.getpid()
+        return _pool
@@ -1,16 +1,74 @@
+from dotenv import load_dotenv
+from instrumentation import configure_logging
+
+# Settings are read from the environment when modules are imported, so .env is loaded before them
+load_dotenv()
+configure_logging()
+
 from llm_tools import analyze_comp, all_comps
+from batch import run_batch, print_report
+import argparse
+import os
+
+SCREEN_PATH = "data/screen.csv"
 
 
 def main():
     user_input = input("Please Enter the company symbol to be analyzed: ")
-    if (user_input not in all_comps.keys()):
-        print(f"Please input correct company symbol")
+    symbol = all_comps.index.exact(user_input)
+    if symbol is None:
+        suggestions = all_comps.index.search(user_input, limit=5)
+        print(f"Please input correct company symbol" + (f", did you mean {', '.join(suggestions)}?" if suggestions else ""))
         return
 
-    result = analyze_comp(user_input)
-    print(f"analysis saved in './data/{user_input}_analysis.md'")
+    result = analyze_comp(symbol)
+    print(f"analysis saved in './data/{symbol}_analysis.md'")
     return result
 
 
+def batch_main(args):
+    symbols = args.symbols or list(all_comps.keys())
+    report = run_batch(symbols, fetch_workers=args.fetch_workers, llm_concurrency=args.llm_concurrency,
+                       mode=args.mode, resume=not args.fresh, prompt_workers=args.prompt_workers,
+                       refresh_statements=args.refresh_statements or None)
+    print_report(report)
+    print(f"analyses saved in './data/{{symbol}}_analysis.md', report in './data/batch_report.json'")
+    return report
+
+
+def screen_main(args):
+    from utils import get_companies_data
+    from fundamentals import screen_universe
+
+    symbols = args.symbols or list(all_comps.keys())
+    screen = screen_universe(get_companies_data(symbols, refresh_statements=args.refresh_statements or None))
+    screen = screen.sort_values(["sector", "Debt-to-Equity"])
+    os.makedirs(os.path.dirname(SCREEN_PATH), exist_ok=True)
+    screen.to_csv(SCREEN_PATH)
+    print(screen[["sector", "Debt-to-Equity", "Current Ratio", "Quick Ratio", "Free cash flow (FCF)", "EPS growth",
+                  "Debt-to-Equity pct", "EPS growth pct"]].to_string(float_format=lambda value: f"{value:.2f}"))
+    print(f"{len(screen)} companies screened, saved in './{SCREEN_PATH}'")
+    return screen
+
+
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Analyze companies with the DeepSeek agents")
+    parser.add_argument("--batch", action="store_true", help="regenerate the analysis of many symbols")
+    parser.add_argument("--screen", action="store_true",
+                        help="screen the fundamentals of many symbols against their sector")
+    parser.add_argument("--symbols", nargs="+", help="symbols for --batch or --screen, defaults to all companies")
+    parser.add_argument("--fetch-workers", type=int, default=4,
+                        help="chunks of symbols fetched at the same time, ahead of the LLM")
+    parser.add_argument("--prompt-workers", type=int, default=2, help="processes building prompts")
+    parser.add_argument("--llm-concurrency", type=int, default=1, help="symbols generated at the same time")
+    parser.add_argument("--mode", choices=["sequential", "parallel", "session"], help="agent execution mode")
+    parser.add_argument("--fresh", action="store_true", help="ignore today's checkpoint and start over")
+    parser.add_argument("--refresh-statements", action="store_true",
+                        help="fetch the quarterly statements even if no earnings date has passed")
+    args = parser.parse_args()
+    if args.batch:
+        batch_main(args)
+    elif args.screen:
+        screen_main(args)
+    else:
+        main()
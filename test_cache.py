@@ -0,0 +1,69 @@
+import pickle
+
+import pandas as pd
+
+import cache
+from cache import SQLiteCache
+
+
+class Clock:
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def test_entries_are_fresh_then_stale_then_missed(tmp_path, monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache.time, "time", clock)
+    store = SQLiteCache(str(tmp_path / "cache.sqlite"))
+    frame = pd.DataFrame({"close": [1.0, 2.0]})
+    store.set("AAPL:price", frame)
+
+    value, state = store.lookup("AAPL:price", ttl=60, stale_ttl=600)
+    assert state == "fresh"
+    pd.testing.assert_frame_equal(value, frame)
+    clock.now += 60
+    assert store.lookup("AAPL:price", ttl=60, stale_ttl=600)[1] == "stale"
+    assert store.lookup("AAPL:price", ttl=60) == (None, "miss")
+    clock.now += 540
+    assert store.lookup("AAPL:price", ttl=60, stale_ttl=600) == (None, "miss")
+    assert store.lookup("MSFT:price", ttl=60) == (None, "miss")
+
+
+def test_recorded_timestamp_is_used_for_the_age(tmp_path, monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache.time, "time", clock)
+    store = SQLiteCache(str(tmp_path / "cache.sqlite"))
+    store.set("AAPL:financialData", {"currentRatio": 1.2}, stored_at=clock.now - 3600)
+    assert store.lookup("AAPL:financialData", ttl=1800) == (None, "miss")
+    assert store.lookup("AAPL:financialData", ttl=7200) == ({"currentRatio": 1.2}, "fresh")
+
+
+def test_least_recently_accessed_entries_are_evicted(tmp_path, monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache.time, "time", clock)
+    value = "x" * 1000
+    size = len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+    store = SQLiteCache(str(tmp_path / "cache.sqlite"), max_bytes=3 * size)
+    for key in ("a", "b", "c"):
+        store.set(key, value)
+        clock.now += 1
+    # Reading 'a' makes 'b' the least recently used entry
+    store.get("a")
+    clock.now += 1
+    store.set("d", value)
+
+    assert store.get("b") is None
+    assert all(store.get(key) is not None for key in ("a", "c", "d"))
+    assert store.total_size() == 3 * size
+
+
+def test_unreadable_entries_are_dropped(tmp_path):
+    store = SQLiteCache(str(tmp_path / "cache.sqlite"))
+    store.set("AAPL:price", 1)
+    with store._lock, store._conn:
+        store._conn.execute("UPDATE entries SET value = ? WHERE key = ?", (b"not a pickle", "AAPL:price"))
+    assert store.get("AAPL:price") is None
+    assert store.total_size() == 0
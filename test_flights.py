@@ -0,0 +1,68 @@
+import threading
+import time
+
+import pytest
+
+from flights import FlightManager, Overloaded
+
+
+def blocking_run(started, release=None):
+    def run(flight):
+        started.set()
+        flight.publish({"event": "token", "response": flight.key})
+        # Runs until released, or until every request left
+        (release or flight.cancel_event).wait(5)
+        return {"cancelled": flight.cancel_event.is_set()}
+    return run
+
+
+def wait_idle(manager, timeout=5):
+    deadline = time.monotonic() + timeout
+    while manager.stats() != {"running": 0, "queued": 0}:
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_identical_requests_share_a_flight():
+    started, release = threading.Event(), threading.Event()
+    manager = FlightManager(blocking_run(started, release), workers=1, queue_size=0)
+    first, attached = manager.join("AAA")
+    assert not attached
+    second, attached = manager.join("AAA")
+    assert attached and second is first
+    release.set()
+    assert [event["response"] for event in first.subscribe()] == ["AAA"]
+    assert [event["response"] for event in second.subscribe()] == ["AAA"]
+    assert first.fields == {"cancelled": False}
+
+
+def test_admission_rejects_new_flights_when_full():
+    started = threading.Event()
+    manager = FlightManager(blocking_run(started), workers=1, queue_size=1)
+    running, _ = manager.join("AAA")
+    queued, _ = manager.join("BBB")
+    with pytest.raises(Overloaded):
+        manager.join("CCC")
+    # Requests for a flight in progress still attach
+    assert manager.join("AAA")[1]
+    for flight in (running, running, queued):
+        flight.subscribe().close()
+    wait_idle(manager)
+    flight, attached = manager.join("CCC")
+    assert not attached
+    flight.subscribe().close()
+
+
+def test_never_iterated_subscription_releases_the_flight():
+    started = threading.Event()
+    manager = FlightManager(blocking_run(started), workers=1, queue_size=0)
+    flight, _ = manager.join("AAA")
+    assert started.wait(5)
+    # The client left before its stream was iterated
+    flight.subscribe().close()
+    wait_idle(manager)
+    assert flight.cancel_event.is_set()
+    assert flight.fields == {"cancelled": True}
+    flight, attached = manager.join("BBB")
+    assert not attached
+    flight.subscribe().close()
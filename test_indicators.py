@@ -0,0 +1,55 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import indicators
+from indicators import COLUMNS, IndicatorEngine
+from utils import process_historical_data
+
+
+def history(days, seed=0):
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range("2025-01-02", periods=days, tz="America/New_York")
+    close = 100 * np.cumprod(1 + rng.normal(0, 0.01, days))
+    return pd.DataFrame({"symbol": "TEST", "date": dates, "close": close, "volume": rng.integers(1, 10, days)})
+
+
+def assert_matches(processed, expected):
+    assert list(processed["date"]) == list(expected["date"])
+    np.testing.assert_allclose(processed[COLUMNS].to_numpy(float), expected[COLUMNS].to_numpy(float),
+                               rtol=1e-9, equal_nan=True)
+
+
+def test_incremental_updates_match_a_full_recompute(tmp_path):
+    bars = history(300)
+    assert_matches(IndicatorEngine("TEST", tmp_path).update(bars.iloc[:250]), process_historical_data(bars.iloc[:250]))
+    for end in (251, 260, 300):
+        assert_matches(IndicatorEngine("TEST", tmp_path).update(bars.iloc[:end]),
+                       process_historical_data(bars.iloc[:end]))
+    # A one-year window of a longer history, as get_company_data returns it
+    assert_matches(IndicatorEngine("TEST", tmp_path).update(bars.iloc[48:]).iloc[200:],
+                   process_historical_data(bars).iloc[248:].reset_index(drop=True))
+
+
+def test_update_without_new_bars_does_no_rolling_work(tmp_path, monkeypatch):
+    bars = history(260)
+    expected = IndicatorEngine("TEST", tmp_path).update(bars)
+    state_mtime = (tmp_path / "TEST.pkl").stat().st_mtime_ns
+
+    pushes = []
+    monkeypatch.setattr(pd.Series, "rolling", lambda *args, **kwargs: pytest.fail("rolling over the input"))
+    for cls in (indicators.RollingMean, indicators.RollingStd):
+        push = cls.push
+        monkeypatch.setattr(cls, "push", lambda self, value, push=push: pushes.append(value) or push(self, value))
+
+    assert_matches(IndicatorEngine("TEST", tmp_path).update(bars), expected)
+    # Only the provisional last bar is pushed, on a copy of the state that is not saved
+    assert len(pushes) == 1 + len(indicators.SMA_WINDOWS)
+    assert (tmp_path / "TEST.pkl").stat().st_mtime_ns == state_mtime
+
+
+def test_adjusted_prices_are_recomputed(tmp_path):
+    bars = history(260)
+    IndicatorEngine("TEST", tmp_path).update(bars)
+    adjusted = bars.assign(close=bars["close"] / 2)
+    assert_matches(IndicatorEngine("TEST", tmp_path).update(adjusted), process_historical_data(adjusted))
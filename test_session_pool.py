@@ -0,0 +1,77 @@
+import threading
+import time
+
+import session_pool
+from session_pool import TokenBucket
+
+
+class Clock:
+    """ Monotonic clock that only moves when the bucket sleeps, so rates must be exact in binary, e.g. 4. """
+
+    def __init__(self):
+        self.now = 100.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def fake_clock(monkeypatch):
+    clock = Clock()
+    # Replaces the module's reference to time only, so pytest and other threads keep the real clock
+    monkeypatch.setattr(session_pool, "time", clock)
+    return clock
+
+
+def test_burst_then_rate(monkeypatch):
+    clock = fake_clock(monkeypatch)
+    bucket = TokenBucket(rate=4, capacity=3)
+    for _ in range(3):
+        bucket.acquire()
+    assert clock.sleeps == []
+
+    start = clock.now
+    for _ in range(10):
+        bucket.acquire()
+    assert abs(clock.now - start - 10 / 4) < 1e-9
+
+
+def test_idle_time_refills_up_to_the_capacity(monkeypatch):
+    clock = fake_clock(monkeypatch)
+    bucket = TokenBucket(rate=4, capacity=3)
+    for _ in range(3):
+        bucket.acquire()
+    clock.now += 60
+    for _ in range(3):
+        bucket.acquire()
+    assert clock.sleeps == []
+    bucket.acquire()
+    assert abs(sum(clock.sleeps) - 1 / 4) < 1e-9
+
+
+def test_pause_holds_every_token(monkeypatch):
+    clock = fake_clock(monkeypatch)
+    bucket = TokenBucket(rate=4, capacity=3)
+    bucket.pause(30)
+    # A shorter pause does not cut the longer one short
+    bucket.pause(1)
+    start = clock.now
+    bucket.acquire()
+    assert clock.now - start >= 30
+
+
+def test_threads_share_the_rate():
+    bucket = TokenBucket(rate=100, capacity=1)
+    bucket.acquire()
+    start = time.monotonic()
+    threads = [threading.Thread(target=lambda: [bucket.acquire() for _ in range(5)]) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # 20 tokens at 100 per second, whichever threads take them
+    assert time.monotonic() - start >= 0.19
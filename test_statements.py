@@ -0,0 +1,36 @@
+from datetime import date, timedelta
+import pandas as pd
+
+from utils import plan_statements, statements_due
+
+
+def statement(*quarters):
+    return pd.DataFrame({"asOfDate": pd.to_datetime(list(quarters))})
+
+
+def earnings(day):
+    return {"earningsChart": {"earningsDate": [day.isoformat()]}}
+
+
+def test_filing_window_closes_once_the_new_quarter_is_in():
+    today = date.today()
+    earnings_day = today - timedelta(days=2)
+    before = plan_statements(None, earnings(earnings_day), [statement("2026-03-31")],
+                             today=earnings_day - timedelta(days=10))
+    before["fetched_at"] -= 12 * 24 * 3600
+    assert statements_due(before, today=today)
+
+    # Fetched after the earnings date but before the filing: checked daily
+    waiting = plan_statements(before, earnings(today + timedelta(days=90)), [statement("2026-03-31")], today=today)
+    assert waiting["filing_until"] is not None
+    waiting["fetched_at"] -= 24 * 3600
+    assert statements_due(waiting, today=today)
+
+    # The filed quarter shows up: nothing is due until the next earnings date
+    filed = plan_statements(waiting, earnings(today + timedelta(days=90)), [statement("2026-03-31", "2026-06-30")],
+                            today=today)
+    assert filed["filing_until"] is None
+    assert filed["latest_statement"] == date(2026, 6, 30)
+    filed["fetched_at"] -= 24 * 3600
+    assert not statements_due(filed, today=today + timedelta(days=1))
+    assert statements_due(filed, today=today + timedelta(days=90))
@@ -0,0 +1,36 @@
+from llm_tools import ThinkFilter
+
+RESPONSE = "<think>Debt is low, margins <b>rise</b>.</think>Healthy balance sheet, P/E < 20."
+
+
+def split(chunks):
+    think_filter = ThinkFilter()
+    channels = {"answer": "", "thinking": ""}
+    for chunk in chunks:
+        for channel, text in think_filter.feed(chunk):
+            channels[channel] += text
+    for channel, text in think_filter.flush():
+        channels[channel] += text
+    return channels
+
+
+def test_tags_split_at_any_point_are_recognised():
+    expected = {"answer": "Healthy balance sheet, P/E < 20.", "thinking": "Debt is low, margins <b>rise</b>."}
+    assert split([RESPONSE]) == expected
+    for cut in range(1, len(RESPONSE)):
+        assert split([RESPONSE[:cut], RESPONSE[cut:]]) == expected, cut
+    # Token by token, as Ollama streams it
+    assert split(list(RESPONSE)) == expected
+
+
+def test_partial_tags_are_held_back_until_the_next_chunk():
+    think_filter = ThinkFilter()
+    assert think_filter.feed("Margins <thi") == [("answer", "Margins ")]
+    assert think_filter.feed("n air") == [("answer", "<thin air")]
+    assert think_filter.feed(" <") == [("answer", " ")]
+    assert think_filter.flush() == [("answer", "<")]
+
+
+def test_unclosed_think_block_is_reasoning_until_the_end():
+    assert split(["Answer <think>still ", "reasoning </thi"]) == {"answer": "Answer ",
+                                                                  "thinking": "still reasoning </thi"}
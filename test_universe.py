@@ -0,0 +1,74 @@
+import threading
+import json
+import time
+
+from universe import SNAPSHOT_VERSION, SymbolIndex, Universe
+
+COMPANIES = {
+    "AAPL": "Apple Inc.",
+    "AMZN": "Amazon.com, Inc.",
+    "AMD": "Advanced Micro Devices, Inc.",
+    "MSFT": "Microsoft Corporation",
+    "BRK-B": "Berkshire Hathaway Inc.",
+    "GOOGL": "Alphabet Inc.",
+}
+
+
+def test_exact_lookup_ignores_case_and_whitespace():
+    index = SymbolIndex(COMPANIES)
+    assert index.exact(" brk-b ") == "BRK-B"
+    assert index.exact("APPL") is None
+
+
+def test_prefix_matches_symbols_before_names():
+    index = SymbolIndex(COMPANIES)
+    assert index.prefix("am") == ["AMD", "AMZN"]
+    assert index.prefix("micro") == ["AMD", "MSFT"]
+    assert index.prefix("a", limit=2) == ["AAPL", "AMD"]
+    assert index.prefix("  ") == []
+
+
+def test_fuzzy_matches_typos():
+    index = SymbolIndex(COMPANIES)
+    assert index.fuzzy("APPL")[0] == "AAPL"
+    assert index.fuzzy("microsfot")[0] == "MSFT"
+    assert index.fuzzy("zzzz") == []
+
+
+def test_search_puts_the_exact_match_first():
+    index = SymbolIndex(COMPANIES)
+    assert index.search("amd")[0] == "AMD"
+    assert index.search("alphabet") == ["GOOGL"]
+    assert len(index.search("a", limit=3)) == 3
+
+
+def test_universe_fetches_only_without_a_snapshot(tmp_path):
+    calls = []
+
+    def fetch(size):
+        calls.append(size)
+        return COMPANIES
+
+    path = str(tmp_path / "universe.json")
+    assert Universe(fetch, size=6, path=path, ttl=3600).top(2) == {"AAPL": "Apple Inc.", "AMZN": "Amazon.com, Inc."}
+    assert "MSFT" in Universe(fetch, size=6, path=path, ttl=3600)
+    assert calls == [6]
+    # A larger universe than the snapshot holds is fetched again
+    assert len(Universe(fetch, size=10, path=path, ttl=3600)) == 6
+    assert calls == [6, 10]
+
+
+def test_expired_snapshot_is_served_while_refreshed(tmp_path):
+    path = tmp_path / "universe.json"
+    path.write_text(json.dumps({"version": SNAPSHOT_VERSION, "source": None, "size": 1,
+                                "fetched_at": time.time() - 7200, "companies": {"AAPL": "Apple Inc."}}))
+    release = threading.Event()
+    universe = Universe(lambda size: release.wait(5) and COMPANIES, size=1, path=str(path), ttl=3600)
+    assert list(universe) == ["AAPL"]
+
+    release.set()
+    deadline = time.time() + 5
+    while len(universe) == 1 and time.time() < deadline:
+        time.sleep(0.01)
+    assert len(universe) == len(COMPANIES)
+    assert json.loads(path.read_text())["companies"] == COMPANIES
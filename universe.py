@@ -0,0 +1,230 @@
+from collections.abc import Mapping
+from collections import Counter
+import threading
+import difflib
+import bisect
+import json
+import time
+import os
+import logging
+
+# Bumped when the snapshot layout changes; snapshots of other versions are fetched again
+SNAPSHOT_VERSION = 1
+
+
+def _trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class SymbolIndex:
+    """
+    In-memory lookup of companies by symbol and short name.
+
+    Symbols and the words of the names are kept sorted, so exact and prefix lookups are a
+    dict access or a binary search. Fuzzy lookup only compares the query with the symbols and
+    names sharing the most trigrams with it, instead of with all of them.
+    """
+
+    def __init__(self, companies):
+        """
+        Args:
+            companies (dict): Mapping of symbol to short name
+        """
+        self.companies = dict(companies)
+        self._symbols = {symbol.upper(): symbol for symbol in self.companies}
+        self._sorted_symbols = sorted(self._symbols)
+        self._names = {}
+        for symbol, name in self.companies.items():
+            name = (name or "").lower()
+            for key in {name, *name.split()} - {""}:
+                self._names.setdefault(key, []).append(symbol)
+        self._sorted_names = sorted(self._names)
+        self._trigrams = {}
+        for key in {*self._names, *(symbol.lower() for symbol in self.companies)}:
+            for trigram in _trigrams(key):
+                self._trigrams.setdefault(trigram, []).append(key)
+
+    def exact(self, query):
+        """
+        Returns:
+            str: The symbol matching `query` regardless of case, or None
+        """
+        return self._symbols.get(query.strip().upper())
+
+    def prefix(self, query, limit=10):
+        """
+        Returns:
+            list: Symbols starting with `query`, then symbols whose name or one of its words does
+        """
+        query = query.strip()
+        if not query:
+            return []
+        matches = []
+        for keys, key, resolve in ((self._sorted_symbols, query.upper(), lambda k: [self._symbols[k]]),
+                                   (self._sorted_names, query.lower(), self._names.get)):
+            for i in range(bisect.bisect_left(keys, key), len(keys)):
+                if not keys[i].startswith(key) or len(matches) >= limit:
+                    break
+                matches.extend(symbol for symbol in resolve(keys[i]) if symbol not in matches)
+        return matches[:limit]
+
+    def fuzzy(self, query, limit=5, cutoff=0.6):
+        """
+        Returns:
+            list: Symbols whose symbol or name is similar to `query`, e.g. with a typo
+        """
+        query = query.strip().lower()
+        shared = Counter()
+        for trigram in _trigrams(query):
+            shared.update(self._trigrams.get(trigram, ()))
+        matcher = difflib.SequenceMatcher(b=query)
+        scored = []
+        for key, _ in shared.most_common(limit * 4):
+            matcher.set_seq1(key)
+            if matcher.ratio() >= cutoff:
+                scored.append((matcher.ratio(), key))
+        symbols = []
+        for _, key in sorted(scored, key=lambda item: -item[0]):
+            candidates = list(self._names.get(key, []))
+            if key.upper() in self._symbols:
+                candidates.append(self._symbols[key.upper()])
+            symbols.extend(symbol for symbol in candidates if symbol not in symbols)
+        return symbols[:limit]
+
+    def search(self, query, limit=10):
+        """
+        Looks a company up the way a user types it.
+
+        Args:
+            query (str): Symbol or name, complete or partial
+            limit (int, optional): Maximum number of results. Defaults to 10.
+
+        Returns:
+            list: Matching symbols, the exact match first, then prefix and fuzzy matches
+        """
+        exact = self.exact(query)
+        matches = [exact] if exact else []
+        for symbol in self.prefix(query, limit) + (self.fuzzy(query, limit) if len(matches) < limit else []):
+            if symbol not in matches:
+                matches.append(symbol)
+        return matches[:limit]
+
+
+class Universe(Mapping):
+    """
+    The companies the apps offer, as a read-only mapping of symbol to short name.
+
+    The list is kept in a snapshot file and only loaded on first access, so importing a module
+    that defines a Universe does not wait on Yahoo Finance. A snapshot older than `ttl` is still
+    served while a fresh list is fetched in the background; only the very first run, without any
+    snapshot, fetches before returning.
+    """
+
+    def __init__(self, fetch, size=250, path=None, ttl=None, source=None):
+        """
+        Args:
+            fetch (callable): Called with `size`, returns a mapping of symbol to short name
+            size (int, optional): Number of companies. Defaults to 250.
+            path (str, optional): Snapshot file. Defaults to UNIVERSE_PATH or data/universe.json.
+            ttl (float, optional): Seconds before the snapshot is refreshed. Defaults to UNIVERSE_TTL or 24 hours.
+            source (str, optional): Data provider the list comes from; snapshots of another one are not used.
+        """
+        self.fetch = fetch
+        self.size = size
+        self.path = path or os.getenv("UNIVERSE_PATH", "data/universe.json")
+        self.ttl = ttl if ttl is not None else float(os.getenv("UNIVERSE_TTL", 24 * 3600))
+        self.source = source
+        self._index = None
+        self._fetched_at = 0.0
+        self._lock = threading.Lock()
+        self._refreshing = False
+
+    def _read_snapshot(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as file:
+                snapshot = json.load(file)
+        except (OSError, ValueError):
+            return None
+        if (snapshot.get("version") != SNAPSHOT_VERSION or snapshot.get("source") != self.source
+                or snapshot.get("size", 0) < self.size):
+            return None
+        return snapshot
+
+    def _write_snapshot(self, companies, fetched_at):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as file:
+            json.dump({"version": SNAPSHOT_VERSION, "source": self.source, "size": self.size,
+                       "fetched_at": fetched_at, "companies": companies}, file)
+        os.replace(temp_path, self.path)
+
+    def _update(self):
+        fetched_at = time.time()
+        companies = dict(self.fetch(self.size))
+        if not companies:
+            raise ValueError("the screener returned no companies")
+        self._write_snapshot(companies, fetched_at)
+        self._index, self._fetched_at = SymbolIndex(companies), fetched_at
+        logging.info(f"Updated the universe snapshot with {len(companies)} companies")
+
+    def _refresh_in_background(self):
+        def refresh():
+            try:
+                self._update()
+            except Exception as e:
+                logging.warning(f"Refreshing the universe failed, keeping the snapshot: {e}")
+                # Retried after a few minutes instead of on every access
+                self._fetched_at = time.time() - self.ttl + min(self.ttl, 300)
+            finally:
+                with self._lock:
+                    self._refreshing = False
+
+        self._refreshing = True
+        threading.Thread(target=refresh, name="universe-refresh", daemon=True).start()
+
+    @property
+    def index(self):
+        """
+        Returns:
+            SymbolIndex: Index of the current list, loaded on first access
+        """
+        with self._lock:
+            if self._index is None:
+                snapshot = self._read_snapshot()
+                if snapshot is None:
+                    self._update()
+                else:
+                    self._index = SymbolIndex(snapshot["companies"])
+                    self._fetched_at = snapshot["fetched_at"]
+            if time.time() - self._fetched_at >= self.ttl and not self._refreshing:
+                self._refresh_in_background()
+            return self._index
+
+    def refresh(self):
+        """
+        Fetches the list now instead of waiting for the snapshot to expire.
+        """
+        with self._lock:
+            self._update()
+
+    def top(self, n):
+        """
+        Returns:
+            dict: The first `n` companies, in the screener's order
+        """
+        return dict(list(self.index.companies.items())[:n])
+
+    def __getitem__(self, symbol):
+        return self.index.companies[symbol]
+
+    def __contains__(self, symbol):
+        return symbol in self.index.companies
+
+    def __iter__(self):
+        return iter(self.index.companies)
+
+    def __len__(self):
+        return len(self.index.companies)
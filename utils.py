@@ -1,28 +1,71 @@
-from yahooquery import Ticker, Screener
-import pandas as pd
 
-from datetime import datetime, timedelta
-from dotenv import load_dotenv
-import yaml
+from concurrent.futures import ThreadPoolExecutor
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from cache import SQLiteCache
+from indicators import IndicatorEngine
+from instrumentation import timed
+from providers import MODULES, STATEMENTS, get_provider
+from prompt_registry import PromptRegistry
+from price_store import PriceStore
+from coalescer import Coalescer
+from universe import Universe
+import threading
+import math
+import time
 import os
 import logging
 import warnings
 
-load_dotenv()
-
 warnings.filterwarnings("ignore")
 
-logging.basicConfig(
-    level=int(os.getenv('LOGGING_LEVEL')),
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-    datefmt="%Y-%m-%d %H:%M:%S"
-)
-logging.getLogger("urllib3").setLevel(logging.ERROR)
+# Read on first use; data/ and the stores in it are likewise only created when written to
+prompts = PromptRegistry("prompts.yaml")
+
+# Seconds for which each kind of data is considered fresh
+CACHE_TTLS = {
+    "price": 5 * 60,
+    "summaryDetail": 15 * 60,
+    "financialData": 6 * 3600,
+    "defaultKeyStatistics": 6 * 3600,
+    "recommendationTrend": 24 * 3600,
+    "earnings": 24 * 3600,
+    "quoteType": 7 * 24 * 3600,
+    "assetProfile": 7 * 24 * 3600,
+    "income_statement": 7 * 24 * 3600,
+    "balance_sheet": 7 * 24 * 3600,
+    "cash_flow": 7 * 24 * 3600,
+    "historical_price": 3600,
+}
+# Expired entries younger than ttl * CACHE_STALE_FACTOR are served while refreshed in the background
+CACHE_STALE_FACTOR = float(os.getenv("CACHE_STALE_FACTOR", 4))
+
+data_cache = SQLiteCache(os.getenv("CACHE_PATH", "data/cache.sqlite"),
+                         max_bytes=int(os.getenv("CACHE_MAX_BYTES", 256 * 1024 * 1024)))
+# Daily bars are kept in their own store and only the missing ones are fetched, see get_price_histories
+price_store = PriceStore()
+# Years of daily bars returned as 'historical_price'
+HISTORY_YEARS = float(os.getenv("HISTORY_YEARS", 1))
+# Concurrent callers missing the same data, e.g. requests of the Flask app, share one fetch
+_inflight = Coalescer()
+# Days after an earnings date during which the statements are checked daily until the filing shows up
+STATEMENT_FILING_DAYS = int(os.getenv("STATEMENT_FILING_DAYS", 45))
+# Fetch the statements on every call instead of when they can have changed, see statements_due
+FORCE_STATEMENT_REFRESH = os.getenv("FORCE_STATEMENT_REFRESH", "0") == "1"
+_refresh_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="cache-refresh")
+_refreshing = set()
+_refreshing_lock = threading.Lock()
+
 
-with open("prompts.yaml", 'r', encoding="utf-8") as file:
-    prompts = yaml.safe_load(file)
+def _reset_refresh_pool():
+    # A forked child does not inherit the pool's threads, so it needs its own pool
+    global _refresh_pool, _refreshing, _refreshing_lock
+    _refresh_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="cache-refresh")
+    _refreshing = set()
+    _refreshing_lock = threading.Lock()
 
-os.makedirs("data", exist_ok=True)
+
+os.register_at_fork(after_in_child=_reset_refresh_pool)
 
 
 def get_top_n_companies(n=250):
@@ -35,9 +78,7 @@ def get_top_n_companies(n=250):
     Returns:
         dict: Dictionary mapping company symbols to company names
     """
-    s = Screener()
-    results = s.get_screeners(['most_actives'], count=n)
-    quotes = results['most_actives']['quotes']
+    quotes = get_provider().screener('most_actives', n)
 
     available_companies = {}
     for quote in quotes:
@@ -48,25 +89,392 @@ def get_top_n_companies(n=250):
     return available_companies
 
 
-def get_company_data(symbol):
+# Companies offered by the apps, loaded from a snapshot on first use instead of at import
+universe = Universe(get_top_n_companies, size=int(os.getenv("UNIVERSE_SIZE", 250)),
+                    source=os.getenv("DATA_PROVIDER", "yahoo"))
+
+
+@timed("provider_fetch")
+def fetch_companies_data(symbols, kinds, max_workers=8):
+    """
+    Fetches the requested kinds of data for several companies from the data provider, bypassing the cache.
+
+    The provider is Yahoo Finance unless DATA_PROVIDER selects recording or replaying fixtures.
+
+    Args:
+        symbols (list): Stock symbols of the companies
+        kinds (list): Module names from MODULES, statement names from STATEMENTS and/or 'historical_price'
+        max_workers (int, optional): Maximum number of concurrent requests. Defaults to 8.
+
+    Returns:
+        dict: Mapping of symbol to a dict of kind to fetched data; data the provider does not have is left out
+    """
+    return get_provider().fetch(symbols, kinds, max_workers=max_workers)
+
+
+def fetch_company_data(symbol, kinds):
+    """
+    Fetches the requested kinds of company data from the data provider, bypassing the cache.
+
+    Args:
+        symbol (str): Stock symbol of the company
+        kinds (list): Module names from MODULES, statement names from STATEMENTS and/or 'historical_price'
+
+    Returns:
+        dict: Mapping of kind to fetched data; data the provider does not have is left out
+    """
+    return fetch_companies_data([symbol], kinds)[symbol]
+
+
+def _store(symbol, fetched):
+    for kind, value in fetched.items():
+        data_cache.set(f"{symbol}:{kind}", value)
+
+
+def next_earnings_date(earnings):
+    """
+    Reads the next earnings date from the 'earnings' module.
+
+    Args:
+        earnings (dict): The company's 'earnings' module
+
+    Returns:
+        date: The earliest announced or estimated earnings date, or None if unknown
+    """
+    import pandas as pd
+
+    dates = []
+    values = ((earnings or {}).get('earningsChart') or {}).get('earningsDate') or []
+    for value in values if isinstance(values, list) else [values]:
+        if isinstance(value, dict):
+            value = value.get('raw')
+        try:
+            # Epoch seconds, or a date string as in the cached fixtures
+            timestamp = pd.Timestamp(value, unit="s") if isinstance(value, (int, float)) else pd.Timestamp(value)
+            dates.append(timestamp.date())
+        except (ValueError, TypeError, OverflowError):
+            continue
+    return min(dates) if dates else None
+
+
+def statements_due(plan, today=None):
+    """
+    Decides whether a symbol's quarterly statements can have changed since they were fetched.
+
+    Statements only change after a filing, so they are fetched again once the earnings date
+    known at the last fetch has passed, and then daily for up to STATEMENT_FILING_DAYS until
+    the filed quarter shows up in them. Without a known upcoming earnings date they expire
+    like other data after CACHE_TTLS['income_statement'].
+
+    Args:
+        plan (dict): {'fetched_at', 'next_earnings', 'filing_until', 'latest_statement'} saved by
+            plan_statements, or None if the statements were never fetched
+        today (date, optional): Defaults to today.
+
+    Returns:
+        bool: True if the statements should be fetched
+    """
+    if plan is None:
+        return True
+    today = today or date.today()
+    fetched_on = date.fromtimestamp(plan["fetched_at"])
+    if fetched_on >= today:
+        return False
+    if plan["filing_until"] is not None and today <= plan["filing_until"]:
+        return True
+    # An earnings date already past when fetching means the calendar was not updated yet
+    if plan["next_earnings"] is not None and plan["next_earnings"] >= fetched_on:
+        return today >= plan["next_earnings"]
+    return time.time() - plan["fetched_at"] >= CACHE_TTLS["income_statement"]
+
+
+def latest_statement_date(statements):
+    """
+    Args:
+        statements (list): Statement DataFrames, e.g. income statement, balance sheet and cash flow
+
+    Returns:
+        date: The most recent 'asOfDate' among them, or None if unknown
+    """
+    import pandas as pd
+
+    dates = []
+    for statement in statements:
+        if isinstance(statement, pd.DataFrame) and "asOfDate" in statement:
+            latest = pd.to_datetime(statement["asOfDate"], errors="coerce").max()
+            if not pd.isna(latest):
+                dates.append(latest.date())
+    return max(dates) if dates else None
+
+
+def plan_statements(previous, earnings, statements=(), today=None):
+    """
+    Records when statements fetched now can change next, for statements_due.
+
+    Args:
+        previous (dict): Plan of the previous fetch, or None
+        earnings (dict): The company's current 'earnings' module
+        statements (list, optional): The statements just fetched
+        today (date, optional): Defaults to today.
+
+    Returns:
+        dict: {'fetched_at', 'next_earnings', 'filing_until', 'latest_statement'}
+    """
+    today = today or date.today()
+    filing_until = None
+    latest = latest_statement_date(statements)
+    previous_latest = previous.get("latest_statement") if previous is not None else None
+    if previous is not None:
+        if previous["next_earnings"] is not None and previous["next_earnings"] <= today:
+            # The earnings date that triggered this fetch opens a filing window
+            filing_until = previous["next_earnings"] + timedelta(days=STATEMENT_FILING_DAYS)
+        elif previous["filing_until"] is not None and previous["filing_until"] >= today:
+            filing_until = previous["filing_until"]
+    if filing_until is not None and latest is not None and previous_latest is not None and latest > previous_latest:
+        # The new quarter is in, so the statements cannot change again before the next earnings date
+        filing_until = None
+    return {"fetched_at": time.time(), "next_earnings": next_earnings_date(earnings), "filing_until": filing_until,
+            "latest_statement": latest or previous_latest}
+
+
+def _refresh_in_background(symbol, kinds):
+    with _refreshing_lock:
+        kinds = [kind for kind in kinds if (symbol, kind) not in _refreshing]
+        _refreshing.update((symbol, kind) for kind in kinds)
+    if not kinds:
+        return
+
+    def refresh():
+        try:
+            _store(symbol, fetch_company_data(symbol, kinds))
+            logging.debug(f"Refreshed {kinds} for {symbol}")
+        except Exception as e:
+            logging.warning(f"Background refresh of {kinds} for {symbol} failed: {e}")
+        finally:
+            with _refreshing_lock:
+                _refreshing.difference_update((symbol, kind) for kind in kinds)
+
+    _refresh_pool.submit(refresh)
+
+
+def _history_adjusted(symbol, bars, on):
+    import pandas as pd
+
+    # Yahoo adjusts past prices after splits (close) and dividends (adjclose)
+    stored = price_store.bar(symbol, on)
+    dates = pd.to_datetime(bars["date"], utc=True).dt.tz_convert(None).dt.date
+    fetched = bars[dates == on]
+    if stored is None or fetched.empty:
+        return True
+    return any(not math.isclose(stored[column], fetched[column].iloc[0], rel_tol=1e-6)
+               for column in ("close", "adjclose") if column in fetched)
+
+
+@timed("price_history")
+def get_price_histories(symbols, years=None, use_cache=True, max_workers=8, chunk_size=50):
+    """
+    Returns daily price bars from the local price store, fetching only the bars it is missing.
+
+    After a fetch the stored bars are up to date for CACHE_TTLS['historical_price']. After
+    that only the bars from the last complete stored day onwards are fetched; the last stored
+    bar may have been an unfinished trading day and is replaced. If the overlapping day's
+    prices changed, Yahoo adjusted the history (e.g. after a split) and all of it is fetched again.
+
+    Args:
+        symbols (list): Stock symbols of the companies
+        years (float, optional): Years of history to return. Defaults to HISTORY_YEARS.
+        use_cache (bool, optional): Fetch new bars even if the store is up to date. Defaults to True.
+        max_workers (int, optional): Maximum number of concurrent requests per batch. Defaults to 8.
+        chunk_size (int, optional): Maximum number of symbols per batch. Defaults to 50.
+
+    Returns:
+        dict: Mapping of symbol to a DataFrame of daily bars backed by the store; symbols without
+            any bars are left out
+    """
+    start = date.today() - timedelta(days=round(365.25 * (years or HISTORY_YEARS)))
+    full = []
+    gaps = defaultdict(list)
+    for symbol in symbols:
+        metadata = price_store.metadata(symbol)
+        dates = price_store.dates(symbol) if metadata else []
+        if metadata is None or metadata["start"] > start or len(dates) < 2:
+            full.append(symbol)
+        elif not use_cache or time.time() - metadata["fetched_at"] >= CACHE_TTLS["historical_price"]:
+            gaps[dates[-2]].append(symbol)
+
+    owned, waiting = _inflight.claim([("history", symbol, start) for symbol in full + sum(gaps.values(), [])])
+    owned = {symbol for _, symbol, _ in owned}
+    full = [symbol for symbol in full if symbol in owned]
+    gaps = {last_complete: [symbol for symbol in group if symbol in owned] for last_complete, group in gaps.items()}
+
+    def fetch(group, fetch_start):
+        fetched = {}
+        for i in range(0, len(group), chunk_size):
+            fetched.update(get_provider().history(group[i:i + chunk_size], fetch_start, max_workers=max_workers))
+        return fetched
+
+    try:
+        for last_complete, group in gaps.items():
+            for symbol, bars in (fetch(group, last_complete) if group else {}).items():
+                if _history_adjusted(symbol, bars, last_complete):
+                    logging.info(f"Price history of {symbol} was adjusted, fetching all of it again")
+                    full.append(symbol)
+                else:
+                    price_store.write(symbol, bars, last_complete)
+        fetched = fetch(full, start) if full else {}
+        for symbol in full:
+            if fetched.get(symbol) is None or fetched[symbol].empty:
+                logging.warning(f"Failed to fetch the price history of {symbol}")
+                continue
+            price_store.write(symbol, fetched[symbol], start, replace=True)
+    except Exception as e:
+        for symbol in owned:
+            _inflight.fail(("history", symbol, start), e)
+        raise
+    for symbol in owned:
+        _inflight.resolve(("history", symbol, start), None)
+    # Bars fetched by another caller are read from the store once it wrote them
+    for future in waiting.values():
+        future.result()
+    logging.debug(f"Fetched the full price history of {len(full)} and new bars of "
+                  f"{sum(map(len, gaps.values()))} of {len(symbols)} symbols, "
+                  f"waited for {len(waiting)} fetched by another caller")
+
+    histories = {}
+    for symbol in symbols:
+        bars = price_store.read(symbol, start=start)
+        if bars is not None and not bars.empty:
+            histories[symbol] = bars
+    return histories
+
+
+@timed("get_company_data")
+def get_companies_data(symbols, use_cache=True, max_workers=8, chunk_size=50, refresh_statements=None):
+    """
+    Fetches comprehensive financial and market data for several companies at once.
+
+    Each kind of data is cached on disk under its own TTL (see CACHE_TTLS). Stale entries
+    are returned immediately and refreshed in the background; missing or expired ones are
+    fetched in multi-symbol batches of `chunk_size` before returning. Quarterly statements
+    are only fetched when an earnings date has passed, see statements_due, and daily bars
+    come from the price store, see get_price_histories.
+
+    Args:
+        symbols (list): Stock symbols of the companies
+        use_cache (bool, optional): Read from the cache. Fetched data is stored either way. Defaults to True.
+        max_workers (int, optional): Maximum number of concurrent requests per batch. Defaults to 8.
+        chunk_size (int, optional): Maximum number of symbols per batch. Defaults to 50.
+        refresh_statements (bool, optional): Fetch the statements even if they cannot have changed.
+            Defaults to FORCE_STATEMENT_REFRESH.
+
+    Returns:
+        dict: Mapping of symbol to company data, in the same shape as get_company_data
+    """
+    kinds = MODULES + STATEMENTS
+    refresh_statements = FORCE_STATEMENT_REFRESH if refresh_statements is None else refresh_statements
+    result = {}
+    missing = {}
+    plans = {}
+    for symbol in symbols:
+        data, symbol_missing, stale = {}, [], []
+        plan = data_cache.get(f"{symbol}:statement_plan")
+        plans[symbol] = plan[0] if plan else None
+        statements_stale = refresh_statements or statements_due(plans[symbol])
+        for kind in kinds:
+            if not use_cache or (kind in STATEMENTS and statements_stale):
+                symbol_missing.append(kind)
+                continue
+            if kind in STATEMENTS:
+                entry = data_cache.get(f"{symbol}:{kind}")
+                if entry is None:
+                    symbol_missing.append(kind)
+                else:
+                    data[kind] = entry[0]
+                continue
+            ttl = CACHE_TTLS[kind]
+            value, state = data_cache.lookup(f"{symbol}:{kind}", ttl, ttl * CACHE_STALE_FACTOR)
+            if state == "miss":
+                symbol_missing.append(kind)
+            else:
+                data[kind] = value
+                if state == "stale":
+                    stale.append(kind)
+        result[symbol] = data
+        if symbol_missing:
+            missing[symbol] = symbol_missing
+        if stale:
+            _refresh_in_background(symbol, stale)
+
+    owned, waiting = _inflight.claim([(symbol, tuple(symbol_missing)) for symbol, symbol_missing in missing.items()])
+    pending = [symbol for symbol, _ in owned]
+    try:
+        for start in range(0, len(pending), chunk_size):
+            chunk = pending[start:start + chunk_size]
+            chunk_kinds = [kind for kind in kinds if any(kind in missing[symbol] for symbol in chunk)]
+            fetched = fetch_companies_data(chunk, chunk_kinds, max_workers=max_workers)
+            for symbol in chunk:
+                _store(symbol, fetched[symbol])
+                result[symbol].update(fetched[symbol])
+                if all(kind in fetched[symbol] for kind in STATEMENTS):
+                    data_cache.set(f"{symbol}:statement_plan",
+                                   plan_statements(plans[symbol], result[symbol].get('earnings'),
+                                                   [result[symbol][kind] for kind in STATEMENTS]))
+                _inflight.resolve((symbol, tuple(missing[symbol])), fetched[symbol])
+    except Exception as e:
+        # Resolved symbols are no longer in flight, so this only fails the ones still waited for
+        for symbol in pending:
+            _inflight.fail((symbol, tuple(missing[symbol])), e)
+        raise
+    for (symbol, _), future in waiting.items():
+        result[symbol].update(future.result())
+    skipped = sum(1 for symbol in symbols if not any(kind in missing.get(symbol, []) for kind in STATEMENTS))
+    logging.debug(f"Skipped the statements of {skipped} of {len(symbols)} symbols until their next earnings date")
+    histories = get_price_histories(symbols, use_cache=use_cache, max_workers=max_workers, chunk_size=chunk_size)
+    for symbol, bars in histories.items():
+        result[symbol]['historical_price'] = bars
+    logging.debug(f"Fetched {len(pending)} of {len(symbols)} symbols from Yahoo Finance, "
+                  f"waited for {len(waiting)} fetched by another caller")
+    return result
+
+
+def get_company_data(symbol, use_cache=True, refresh_statements=None):
     """
     Fetches comprehensive financial and market data for a company.
+
+    See get_companies_data for how the data is cached.
     
     Args:
         symbol (str): Stock symbol of the company
+        use_cache (bool, optional): Read from the cache. Fetched data is stored either way. Defaults to True.
+        refresh_statements (bool, optional): Fetch the statements even if they cannot have changed.
+            Defaults to FORCE_STATEMENT_REFRESH.
         
     Returns:
         dict: Company data including financial statements, market data, and historical prices
     """
-    ticker = Ticker(symbol)
-    modules = ["summaryDetail", "financialData", "quoteType", "defaultKeyStatistics", "earnings", "price",
-               "recommendationTrend", "assetProfile"]
-    data = ticker.get_modules(modules)
-    data[symbol]['income_statement'] = ticker.income_statement(frequency='q', trailing=False)
-    data[symbol]['balance_sheet'] = ticker.balance_sheet(frequency='q', trailing=False)
-    data[symbol]['cash_flow'] = ticker.cash_flow(frequency='q', trailing=False)
-    data[symbol]['historical_price'] = ticker.history(period='1y', interval='1d').reset_index()
-    return data
+    return get_companies_data([symbol], use_cache=use_cache, refresh_statements=refresh_statements)
+
+
+def warm_cache(symbols, chunk_size=50):
+    """
+    Populates the data cache for a list of symbols, e.g. the whole universe before a batch run.
+
+    Args:
+        symbols (list): Stock symbols to fetch
+        chunk_size (int, optional): Maximum number of symbols per batch. Defaults to 50.
+
+    Returns:
+        list: Symbols that failed to fetch
+    """
+    failed = []
+    for start in range(0, len(symbols), chunk_size):
+        chunk = symbols[start:start + chunk_size]
+        try:
+            get_companies_data(chunk, chunk_size=chunk_size)
+        except Exception as e:
+            logging.warning(f"Failed to warm cache for {chunk}: {e}")
+            failed.extend(chunk)
+    return failed
 
 
 def define_trend(regularMarketChange):
@@ -97,12 +505,8 @@ def get_eps_trend(df):
     Returns:
         dict: Mapping of dates to Basic EPS values, excluding TTM periods
     """
-    result = {
-        row['asOfDate']: row['BasicEPS']
-        for _, row in df.iterrows()
-        if row['periodType'] != "TTM" and not pd.isna(row['BasicEPS'])
-    }
-    return result
+    mask = (df['periodType'] != "TTM") & df['BasicEPS'].notna()
+    return dict(zip(df.loc[mask, 'asOfDate'], df.loc[mask, 'BasicEPS']))
 
 
 def compute_financial_metrics(balance_sheet_df, cashflow_df):
@@ -117,6 +521,8 @@ def compute_financial_metrics(balance_sheet_df, cashflow_df):
         dict: Financial ratios and metrics including debt-to-equity, liquidity ratios,
               and cash flow metrics indexed by date
     """
+    import pandas as pd
+
     # Merge both DataFrames on 'asOfDate' to align data
     merged_df = pd.merge(balance_sheet_df, cashflow_df, on="asOfDate", how="inner")
 
@@ -173,16 +579,26 @@ def define_sentiment(historical_data, threshold=1.05):
     return sentiment
 
 
-def process_historical_data(real_historical_data):
+@timed("process_historical_data")
+def process_historical_data(real_historical_data, symbol=None):
     """
     Processes historical price data to calculate technical indicators.
+
+    With a symbol, the indicators are updated incrementally from the persisted state of
+    an IndicatorEngine, so only bars newer than the previous call are processed.
     
     Args:
         real_historical_data (DataFrame): Raw historical price data
+        symbol (str, optional): Stock symbol whose indicator state to use. Defaults to None.
         
     Returns:
         DataFrame: Processed data with daily returns, volatility, and moving averages
     """
+    import pandas as pd
+
+    if symbol is not None:
+        return IndicatorEngine(symbol).update(real_historical_data)
+
     historical_data = real_historical_data.copy()
     historical_data['date'] = pd.to_datetime(historical_data['date'], utc=True).dt.tz_convert(None)
     historical_data['date'] = historical_data['date'].dt.date